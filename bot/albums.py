@@ -0,0 +1,74 @@
+# bot/albums.py
+"""
+Сборка альбомов: Telegram присылает каждую фотографию альбома отдельным
+сообщением с общим media_group_id. Первое сообщение группы ждёт, пока
+не перестанут приходить остальные, и получает всю пачку целиком.
+"""
+import asyncio
+from typing import Dict, List
+
+from telebot.async_telebot import types
+
+ALBUM_WINDOW = 0.5   # сек. тишины, после которой альбом считается полным
+MEDIA_GROUP_LIMIT = 10   # максимум элементов в send_media_group
+
+_PENDING: Dict[str, List[types.Message]] = {}
+
+
+async def collect_album(message: types.Message) -> List[types.Message] | None:
+    """
+    Возвращает все сообщения альбома первому обработчику группы
+    и None — остальным (их фото уже учтены в пачке первого).
+    """
+    group = message.media_group_id
+    if not group:
+        return [message]
+
+    batch = _PENDING.get(group)
+    if batch is not None:
+        batch.append(message)
+        return None
+
+    batch = _PENDING[group] = [message]
+    seen = 0
+    while seen != len(batch):
+        seen = len(batch)
+        await asyncio.sleep(ALBUM_WINDOW)
+    _PENDING.pop(group, None)
+    return sorted(batch, key=lambda m: m.message_id)
+
+
+def photo_meta(batch: List[types.Message], known: List = ()) -> List[dict]:
+    """
+    Метаданные фотографий пачки для таблицы photos: крупнейший и наименьший
+    PhotoSize. Повторы (по file_unique_id) внутри пачки и среди known отброшены.
+    """
+    # в черновиках до введения таблицы photos лежат строки file_id — их пропускаем
+    seen = {p["file_unique_id"] for p in known if isinstance(p, dict)}
+    out = []
+    for m in batch:
+        if not m.photo:
+            continue
+        big, small = m.photo[-1], m.photo[0]
+        if big.file_unique_id in seen:
+            continue
+        seen.add(big.file_unique_id)
+        out.append({
+            "file_unique_id": big.file_unique_id,
+            "file_id":        big.file_id,
+            "thumb_file_id":  small.file_id,
+            "width":          big.width,
+            "height":         big.height,
+            "file_size":      big.file_size,
+        })
+    return out
+
+
+async def send_photos(bot, chat_id: int, file_ids: List[str]):
+    """Одна фотография — send_photo, несколько — альбомами по 10."""
+    for i in range(0, len(file_ids), MEDIA_GROUP_LIMIT):
+        chunk = file_ids[i:i + MEDIA_GROUP_LIMIT]
+        if len(chunk) == 1:
+            await bot.send_photo(chat_id, chunk[0])
+        else:
+            await bot.send_media_group(chat_id, [types.InputMediaPhoto(f) for f in chunk])
@@ -0,0 +1,60 @@
+# bot/dedup.py
+"""
+Отбрасываем повторно доставленные апдейты (переподключение polling,
+повтор вебхука) до того, как они дойдут до обработчиков и БД.
+
+Сообщение однозначно задаётся парой (chat_id, message_id), callback — его id,
+поэтому этого достаточно и без update_id, которого middleware не видит.
+"""
+import time
+from collections import OrderedDict
+
+from telebot.async_telebot import types
+from telebot.asyncio_handler_backends import BaseMiddleware, CancelUpdate
+
+DEDUP_SIZE = 10_000   # сколько последних ключей помним
+DEDUP_TTL  = 600      # сек.
+
+
+class SeenCache:
+    """Ограниченный по размеру и времени жизни набор ключей (LRU + TTL)."""
+
+    def __init__(self, size: int = DEDUP_SIZE, ttl: float = DEDUP_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._keys: OrderedDict[str, float] = OrderedDict()
+
+    def add(self, key: str) -> bool:
+        """True — ключ новый, False — уже встречался в пределах TTL."""
+        now = time.monotonic()
+        # выкидываем протухшие ключи с головы (они самые старые)
+        while self._keys:
+            oldest, ts = next(iter(self._keys.items()))
+            if now - ts < self.ttl:
+                break
+            self._keys.popitem(last=False)
+
+        if key in self._keys:
+            return False
+        self._keys[key] = now
+        if len(self._keys) > self.size:
+            self._keys.popitem(last=False)
+        return True
+
+
+class DedupMiddleware(BaseMiddleware):
+    def __init__(self, cache: SeenCache | None = None):
+        super().__init__()
+        self.update_types = ["message", "callback_query"]
+        self.seen = cache or SeenCache()
+
+    async def pre_process(self, update, data):
+        if isinstance(update, types.CallbackQuery):
+            key = f"cb:{update.id}"
+        else:
+            key = f"msg:{update.chat.id}:{update.message_id}"
+        if not self.seen.add(key):
+            return CancelUpdate()
+
+    async def post_process(self, update, data, exception):
+        pass
@@ -5,7 +5,7 @@ from bot.config import ADMIN_IDS      # список TG-ID саппорта
 def top_menu(user_id: int) -> types.ReplyKeyboardMarkup:
     kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
     kb.row("Оставить заявку", "Выдача оборудования")
-    kb.row("Просмотр оборудования")
+    kb.row("Просмотр оборудования", "Мои заявки и оборудование")
     if user_id in ADMIN_IDS:          # кнопка только для саппорта
         kb.row("Координация с поддержкой")
     return kb
@@ -26,6 +26,11 @@ def register_basic_handlers(bot: AsyncTeleBot):
         from bot.handlers.couriers import show_equipment_status
         await show_equipment_status(bot, msg)
 
+    @bot.message_handler(func=lambda m: m.text == "Мои заявки и оборудование")
+    async def _my_view(msg: types.Message):
+        from bot.handlers.couriers import show_my_view
+        await show_my_view(bot, msg)
+
     @bot.message_handler(func=lambda m: m.text == "Координация с поддержкой")
     async def _support_menu(msg: types.Message):
         from bot.handlers.support import show_support_dashboard
@@ -1,9 +1,14 @@
 # bot/handlers/couriers.py
+import time
+from collections import OrderedDict
+
 from telebot.async_telebot import AsyncTeleBot, types
+from telebot.asyncio_helper import ApiTelegramException
 from sqlalchemy import select
 
+from db import counters, events
 from db.database import AsyncSessionLocal
-from db.models import Equipment, EquipmentStatus
+from db.models import Equipment, EquipmentStatus, Request, RequestStatus
 
 PER_PAGE = 10
 ICON = {
@@ -23,14 +28,16 @@ def _keyboard(page: int, total_pages: int):
 
 async def _render_page(bot: AsyncTeleBot, chat_id: int, msg_id: int | None, page: int, edit: bool):
     async with AsyncSessionLocal() as sess:
-        eq_list = (await sess.execute(select(Equipment))).scalars().all()
-
-    total_pages = max(1, (len(eq_list) + PER_PAGE - 1) // PER_PAGE)
-    page = max(0, min(page, total_pages - 1))
-    start, end = page * PER_PAGE, (page + 1) * PER_PAGE
+        total = await counters.total(sess, counters.EQ_KEYS)
+        total_pages = max(1, (total + PER_PAGE - 1) // PER_PAGE)
+        page = max(0, min(page, total_pages - 1))
+        eq_list = (await sess.execute(
+            select(Equipment).order_by(Equipment.id)
+            .offset(page * PER_PAGE).limit(PER_PAGE)
+        )).scalars().all()
 
     lines = []
-    for eq in eq_list[start:end]:
+    for eq in eq_list:
         icon = ICON[eq.status]
         if eq.status == EquipmentStatus.WITH_COURIER and eq.assigned_to:
             status = f"У курьера #{eq.assigned_to}"
@@ -51,12 +58,126 @@ async def _render_page(bot: AsyncTeleBot, chat_id: int, msg_id: int | None, page
         await bot.send_message(chat_id, text,
                                reply_markup=kb, parse_mode="Markdown")
 
+# ───────────────────── «Мои заявки и оборудование» ─────────────────────
+# Страницы кэшируются на пользователя; кэш сбрасывается событиями шины
+# (db.events) о заявках/оборудовании этого пользователя, плюс TTL.
+MY_PER_PAGE    = 8
+SNAPSHOT_TTL   = 300    # сек.
+SNAPSHOT_USERS = 1000   # сколько пользователей держим в кэше (LRU)
+
+MY_STATUS = {
+    RequestStatus.OPEN:        "🆕 открыта",
+    RequestStatus.IN_PROGRESS: "🔧 в работе",
+    RequestStatus.NEED_INFO:   "❓ нужен ответ",
+    RequestStatus.CLOSED:      "✅ закрыта",
+}
+
+# user_id -> {(kind, cursor): (expires_at, text, next_cursor)}
+_SNAPSHOTS: "OrderedDict[int, dict]" = OrderedDict()
+_epoch = 0   # растёт при каждом сбросе: страница, собранная до сброса, в кэш не попадёт
+
+
+def _invalidate(event: dict):
+    global _epoch
+    _epoch += 1
+    if event["kind"] == "resync" or event.get("truncated"):
+        _SNAPSHOTS.clear()
+        return
+    for uid in event.get("user_ids") or [event.get("user_id")]:
+        _SNAPSHOTS.pop(uid, None)
+
+
+async def _load_my_page(user_id: int, kind: str, cursor: int):
+    """Keyset-страница: заявки по id убыванию, оборудование по id возрастанию."""
+    async with AsyncSessionLocal() as sess:
+        if kind == "r":
+            stmt = select(Request).where(Request.user_id == user_id).order_by(Request.id.desc())
+            if cursor:
+                stmt = stmt.where(Request.id < cursor)
+        else:
+            stmt = select(Equipment).where(Equipment.assigned_to == user_id).order_by(Equipment.id)
+            if cursor:
+                stmt = stmt.where(Equipment.id > cursor)
+        rows = (await sess.execute(stmt.limit(MY_PER_PAGE + 1))).scalars().all()
+
+    more, rows = len(rows) > MY_PER_PAGE, rows[:MY_PER_PAGE]
+    if kind == "r":
+        title = "Мои заявки"
+        lines = [f"#{r.id} • {r.title} — {MY_STATUS[r.status]}" for r in rows]
+    else:
+        title = "Моё оборудование"
+        lines = [
+            f"{ICON[eq.status]} {eq.eq_id} ({eq.type})"
+            + (" — нужен ремонт" if eq.status == EquipmentStatus.NEED_REPAIR else "")
+            for eq in rows
+        ]
+    text = f"{title}\n\n" + ("\n".join(lines) or "пусто")
+    return text, (rows[-1].id if more else None)
+
+
+async def _my_page(user_id: int, kind: str, cursor: int):
+    pages = _SNAPSHOTS.get(user_id)
+    hit = pages.get((kind, cursor)) if pages else None
+    if hit and hit[0] > time.monotonic():
+        _SNAPSHOTS.move_to_end(user_id)
+        return hit[1], hit[2]
+
+    epoch = _epoch
+    text, next_cursor = await _load_my_page(user_id, kind, cursor)
+    if epoch == _epoch:
+        _SNAPSHOTS.setdefault(user_id, {})[(kind, cursor)] = (
+            time.monotonic() + SNAPSHOT_TTL, text, next_cursor
+        )
+        _SNAPSHOTS.move_to_end(user_id)
+        while len(_SNAPSHOTS) > SNAPSHOT_USERS:
+            _SNAPSHOTS.popitem(last=False)
+    return text, next_cursor
+
+
+def _my_keyboard(kind: str, cursor: int, next_cursor: int | None):
+    kb = types.InlineKeyboardMarkup()
+    kb.row(
+        types.InlineKeyboardButton("📋 Заявки" + (" •" if kind == "r" else ""), callback_data="my:r:0"),
+        types.InlineKeyboardButton("🚴 Оборудование" + (" •" if kind == "e" else ""), callback_data="my:e:0"),
+    )
+    nav = []
+    if cursor:
+        nav.append(types.InlineKeyboardButton("⏮ В начало", callback_data=f"my:{kind}:0"))
+    if next_cursor:
+        nav.append(types.InlineKeyboardButton("▶️ Далее", callback_data=f"my:{kind}:{next_cursor}"))
+    if nav:
+        kb.row(*nav)
+    kb.add(types.InlineKeyboardButton("❌ Закрыть", callback_data="eq_close"))
+    return kb
+
+
 # ───────────────────── публичные обработчики ─────────────────────
 async def show_equipment_status(bot: AsyncTeleBot, message: types.Message):
     """Вызывается из basic.py по кнопке «Просмотр оборудования»."""
     await _render_page(bot, message.chat.id, None, page=0, edit=False)
 
+async def show_my_view(bot: AsyncTeleBot, message: types.Message):
+    """Вызывается из basic.py по кнопке «Мои заявки и оборудование»."""
+    text, next_cursor = await _my_page(message.from_user.id, "r", 0)
+    await bot.send_message(message.chat.id, text, reply_markup=_my_keyboard("r", 0, next_cursor))
+
 def register_courier_handlers(bot: AsyncTeleBot):
+    for kind in ("request_created", "request_changed", "equipment_changed", "resync"):
+        events.subscribe(kind, _invalidate)
+
+    @bot.callback_query_handler(lambda c: c.data.startswith("my:"))
+    async def _my_paginate(call: types.CallbackQuery):
+        _, kind, cursor = call.data.split(":", 2)
+        text, next_cursor = await _my_page(call.from_user.id, kind, int(cursor))
+        await bot.answer_callback_query(call.id)
+        try:
+            await bot.edit_message_text(text, call.message.chat.id, call.message.id,
+                                        reply_markup=_my_keyboard(kind, int(cursor), next_cursor))
+        except ApiTelegramException as e:
+            # нажали на уже открытую вкладку — показывать нечего нового
+            if "message is not modified" not in str(e):
+                raise
+
     @bot.callback_query_handler(lambda c: c.data.startswith("eq_page:"))
     async def _paginate(call: types.CallbackQuery):
         page = int(call.data.split(":", 1)[1])
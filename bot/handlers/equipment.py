@@ -6,7 +6,11 @@ from uuid import uuid4
 
 from telebot.async_telebot import AsyncTeleBot, types
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
+from bot.albums import collect_album, photo_meta
+from bot.idlists import parse_ids
+from db import bulk, counters, events, photos
 from db.database import AsyncSessionLocal
 from db.models import Equipment, Request, RequestStatus, EquipmentStatus, User
 
@@ -14,9 +18,13 @@ logger = logging.getLogger(__name__)
 
 # Временное хранилище черновиков для оборудования
 EQUIP_DRAFTS: dict[str, dict] = {}
-# Структура: { draft_id: { user_id, step, action, eq, eq_id, issue_desc } }
+# Структура: { draft_id: { user_id, step, action, eq_pk, eq_id, issue_desc } }
 
 ACTIONS = ["Выдать курьеру", "Принять на склад", "Нужен ремонт"]
+BULK_EQ_ACTIONS = {
+    "stock":  EquipmentStatus.IN_STOCK,
+    "repair": EquipmentStatus.NEED_REPAIR,
+}
 
 
 def register_equipment_handlers(bot: AsyncTeleBot, admin_id: int):
@@ -47,9 +55,41 @@ def register_equipment_handlers(bot: AsyncTeleBot, admin_id: int):
                 status=EquipmentStatus.IN_STOCK,
                 assigned_to=None
             ))
+            await counters.track_equipment(sess, [(None, EquipmentStatus.IN_STOCK)])
+            await events.publish(sess, "equipment_changed", eq_ids=[eq_id], user_ids=[])
             await sess.commit()
         await bot.reply_to(msg, f"✅ Оборудование добавлено: {eq_id} ({eq_type})")
 
+    # ─────────── массовые операции с оборудованием ───────────
+    @bot.message_handler(commands=["bulk_equipment"])
+    async def bulk_equipment_cmd(msg: types.Message):
+        if msg.from_user.id != admin_id:
+            return await bot.reply_to(msg, "⛔ Только администратор.")
+        parts = msg.text.split()
+        status = BULK_EQ_ACTIONS.get(parts[1]) if len(parts) > 2 else None
+        if status is None:
+            return await bot.reply_to(
+                msg,
+                "Использование: /bulk_equipment <stock|repair> <ID или диапазоны>\n"
+                "Пример: /bulk_equipment stock 0001-0050 BK-7"
+            )
+        try:
+            eq_ids = parse_ids(parts[2:])
+        except ValueError as e:
+            return await bot.reply_to(msg, f"⚠️ {e}")
+
+        async with AsyncSessionLocal() as sess:
+            rows = await bulk.set_equipment_status(sess, eq_ids, status)
+            await sess.commit()
+
+        skipped = bulk.missing(eq_ids, [r.eq_id for r in rows])
+        text = f"✅ Обновлено: {len(rows)} из {len(eq_ids)}"
+        if skipped:
+            text += "\nНе найдено или уже в этом статусе: " + ", ".join(skipped[:20])
+            if len(skipped) > 20:
+                text += " …"
+        await bot.reply_to(msg, text)
+
     # ─────────── стартовый экран для операций с оборудованием ───────────
     @bot.message_handler(func=lambda m: m.text == "Выдача оборудования")
     async def start_equipment(msg: types.Message):
@@ -98,14 +138,14 @@ def register_equipment_handlers(bot: AsyncTeleBot, admin_id: int):
             )).scalar_one_or_none()
         if not eq:
             return await bot.reply_to(msg, "❌ Оборудование не найдено, попробуйте другой ID.")
-        draft.update({"eq": eq, "eq_id": eq_id})
+        draft.update({"eq_pk": eq.id, "eq_id": eq_id})
 
         action = draft["action"]
         if action == "Выдать курьеру":
             draft["step"] = "courier_id"
             await bot.reply_to(msg, "Введите ID курьера:")
         elif action == "Принять на склад":
-            await _update_status(eq, EquipmentStatus.IN_STOCK, None)
+            await _update_status(eq.id, EquipmentStatus.IN_STOCK, None)
             EQUIP_DRAFTS.pop(did, None)
             await bot.reply_to(msg, "✅ Оборудование принято на склад")
         else:  # "Нужен ремонт"
@@ -127,7 +167,7 @@ def register_equipment_handlers(bot: AsyncTeleBot, admin_id: int):
                 sess.add(User(id=courier_id, name=""))
                 await sess.flush()
 
-        await _update_status(draft["eq"], EquipmentStatus.WITH_COURIER, courier_id)
+        await _update_status(draft["eq_pk"], EquipmentStatus.WITH_COURIER, courier_id)
         EQUIP_DRAFTS.pop(did, None)
         await bot.reply_to(msg, "✅ Оборудование выдано курьеру")
 
@@ -144,11 +184,17 @@ def register_equipment_handlers(bot: AsyncTeleBot, admin_id: int):
     # ─────────── приём фото ───────────
     @bot.message_handler(content_types=["photo"], func=lambda m: _draft_step(m.from_user.id) == "photo")
     async def got_photo(msg: types.Message):
-        did, draft = _find_draft(msg.from_user.id)
-        photo_id = msg.photo[-1].file_id
-        await _save_repair_request(draft, photo_id)
+        # все фото альбома попадают в одну заявку
+        batch = await collect_album(msg)
+        if batch is None:
+            return
+        try:
+            did, draft = _find_draft(msg.from_user.id)
+        except ValueError:
+            return
         EQUIP_DRAFTS.pop(did, None)
-        await bot.reply_to(msg, "✅ Заявка на ремонт зарегистрирована")
+        req_id = await _save_repair_request(did, draft, photo_meta(batch))
+        await bot.reply_to(msg, f"✅ Заявка на ремонт #{req_id} зарегистрирована")
 
     # ─────────── пропуск фото ───────────
     @bot.callback_query_handler(lambda c: c.data.startswith("eq_skip:"))
@@ -156,7 +202,7 @@ def register_equipment_handlers(bot: AsyncTeleBot, admin_id: int):
         did = call.data.split(":", 1)[1]
         draft = EQUIP_DRAFTS.pop(did, None)
         if draft:
-            await _save_repair_request(draft, photo_id=None)
+            await _save_repair_request(did, draft, metas=[])
         await bot.answer_callback_query(call.id, "✅ Заявка на ремонт зарегистрирована")
         await bot.edit_message_reply_markup(call.message.chat.id, call.message.id, reply_markup=None)
 
@@ -174,35 +220,55 @@ def register_equipment_handlers(bot: AsyncTeleBot, admin_id: int):
         except ValueError:
             return None
 
-    async def _update_status(eq: Equipment, status: EquipmentStatus, courier_id: int | None):
+    async def _update_status(eq_pk: int, status: EquipmentStatus, courier_id: int | None):
         async with AsyncSessionLocal() as sess:
             if courier_id is not None and not await sess.get(User, courier_id):
                 sess.add(User(id=courier_id, name=""))
                 await sess.flush()
 
-            eq.status      = status
-            eq.assigned_to = courier_id
-            sess.add(eq)
+            # берём актуальную строку под блокировкой: черновик мог устареть
+            cur = await sess.get(Equipment, eq_pk, with_for_update=True)
+            await counters.track_equipment(sess, [(cur.status, status)])
+            await events.publish(
+                sess, "equipment_changed", eq_ids=[cur.eq_id],
+                user_ids=[u for u in {cur.assigned_to, courier_id} if u is not None],
+            )
+            cur.status      = status
+            cur.assigned_to = courier_id
             await sess.commit()
 
-    async def _save_repair_request(draft: dict, photo_id: str | None):
+    async def _save_repair_request(did: str, draft: dict, metas: list[dict]) -> int:
+        """Создаёт заявку на ремонт; если по этому черновику она уже есть — возвращает её id."""
         async with AsyncSessionLocal() as sess:
             user_id = draft["user_id"]
             if not await sess.get(User, user_id):
                 sess.add(User(id=user_id, name=""))
                 await sess.flush()
-            sess.add(Request(
-                user_id=user_id,
-                category="Ремонт оборудования",
-                subcategory=draft["eq_id"],
-                title=f"Ремонт {draft['eq_id']}",
-                description=draft["issue_desc"],
-                priority="средний",
-                photos=[photo_id] if photo_id else [],
-                status=RequestStatus.OPEN,
-                created_at=datetime.utcnow()
-            ))
+            # did — ключ идемпотентности: повтор не создаст вторую заявку
+            req_id = await sess.scalar(
+                pg_insert(Request).values(
+                    user_id=user_id,
+                    category="Ремонт оборудования",
+                    subcategory=draft["eq_id"],
+                    title=f"Ремонт {draft['eq_id']}",
+                    description=draft["issue_desc"],
+                    priority="средний",
+                    photos=await photos.store(sess, metas),
+                    status=RequestStatus.OPEN,
+                    created_at=datetime.utcnow(),
+                    draft_id=did,
+                )
+                .on_conflict_do_nothing(index_elements=[Request.draft_id])
+                .returning(Request.id)
+            )
+            if req_id is None:
+                return await sess.scalar(select(Request.id).where(Request.draft_id == did))
+            await counters.track_requests(
+                sess, [("Ремонт оборудования", "средний", None, RequestStatus.OPEN)]
+            )
+            await events.publish(sess, "request_created", id=req_id, user_id=user_id)
             await sess.commit()
+        return req_id
 
     PER_PAGE = 10
     STATUS_ICON = {
@@ -240,14 +306,16 @@ def register_equipment_handlers(bot: AsyncTeleBot, admin_id: int):
 
     async def _send_equipment_page(chat_id: int, message_id: int, page: int, edit: bool = False):
         async with AsyncSessionLocal() as sess:
-            items = (await sess.execute(select(Equipment))).scalars().all()
-
-        total_pages = max(1, (len(items) + PER_PAGE - 1) // PER_PAGE)
-        page = max(0, min(page, total_pages - 1))
-        start, end = page * PER_PAGE, (page + 1) * PER_PAGE
+            total = await counters.total(sess, counters.EQ_KEYS)
+            total_pages = max(1, (total + PER_PAGE - 1) // PER_PAGE)
+            page = max(0, min(page, total_pages - 1))
+            items = (await sess.execute(
+                select(Equipment).order_by(Equipment.id)
+                .offset(page * PER_PAGE).limit(PER_PAGE)
+            )).scalars().all()
 
         lines = []
-        for eq in items[start:end]:
+        for eq in items:
             icon = STATUS_ICON[eq.status]
             if eq.status == EquipmentStatus.WITH_COURIER and eq.assigned_to:
                 status_txt = f"У курьера #{eq.assigned_to}"
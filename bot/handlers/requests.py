@@ -3,8 +3,14 @@ from uuid import uuid4
 from datetime import datetime
 
 from telebot.async_telebot import AsyncTeleBot, types
+from telebot.asyncio_helper import ApiTelegramException
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from bot.albums import collect_album, photo_meta, send_photos
+from db import counters, events, photos
 from db.database import AsyncSessionLocal
-from db.models import Request, User
+from db.models import Request, RequestStatus, User
 
 logger = logging.getLogger(__name__)
 
@@ -140,13 +146,21 @@ def register_request_handlers(bot: AsyncTeleBot, admin_id: int):
         for d in DRAFTS.values()
     ))
     async def process_photo(message: types.Message):
-        did, draft = next(
-            (did, d) for did, d in DRAFTS.items()
-            if d["user_id"] == message.from_user.id and d.get("step") == "photo"
+        # альбом приходит пачкой сообщений — обрабатываем его один раз целиком
+        batch = await collect_album(message)
+        if batch is None:
+            return
+        found = next(
+            ((did, d) for did, d in DRAFTS.items()
+             if d["user_id"] == message.from_user.id and d.get("step") == "photo"),
+            None
         )
-        photos = draft.get("photos", [])
-        photos.append(message.photo[-1].file_id)
-        draft["photos"] = photos
+        if not found:
+            return
+        did, draft = found
+        # одно и то же фото, присланное повторно, не добавляется
+        new = photo_meta(batch, draft.get("photos", []))
+        draft["photos"] = draft.get("photos", []) + new
         draft["step"] = "finalize"
         kb = types.InlineKeyboardMarkup()
         kb.row(
@@ -154,9 +168,12 @@ def register_request_handlers(bot: AsyncTeleBot, admin_id: int):
             types.InlineKeyboardButton("▶️ Далее", callback_data=f"req_confirm:{did}"),
             types.InlineKeyboardButton("Пропустить", callback_data=f"req_skip:{did}")
         )
+        added = "Фото добавлено" if len(new) == 1 else f"Добавлено фото: {len(new)}"
+        if len(new) < len(batch):
+            added += f" (повторов пропущено: {len(batch) - len(new)})"
         await bot.send_message(
             message.chat.id,
-            "Фото добавлено. Выберите действие:",
+            f"{added}. Выберите действие:",
             reply_markup=kb
         )
 
@@ -173,35 +190,59 @@ def register_request_handlers(bot: AsyncTeleBot, admin_id: int):
             return
 
         async with AsyncSessionLocal() as sess:
-            user = await sess.get(User, draft["user_id"])
-            if not user:
-                user = User(
+            await sess.execute(
+                pg_insert(User).values(
                     id=draft["user_id"],
                     name=call.from_user.username or call.from_user.first_name or ""
-                )
-                sess.add(user)
-                await sess.flush()
-
-            req_obj = Request(
+                ).on_conflict_do_nothing(index_elements=[User.id])
+            )
+            draft_photos = draft.get("photos") or []
+            # draft_id уникален: повторная доставка, двойное нажатие «Далее» или
+            # повтор после рестарта (заявка записана, черновик не успел удалиться)
+            # ничего не вставят и вернут None
+            values = dict(
                 user_id=draft["user_id"],
                 category=draft["category"],
                 subcategory=draft.get("subcategory"),
                 title=draft.get("title"),
                 description=draft.get("description"),
                 priority=draft.get("priority"),
-                photos=draft.get("photos"),
-                created_at=datetime.utcnow()
+                photos=await photos.store(sess, draft_photos),
+                status=RequestStatus.OPEN,
+                created_at=datetime.utcnow(),
+                draft_id=did,
+            )
+            req_id = await sess.scalar(
+                pg_insert(Request).values(**values)
+                .on_conflict_do_nothing(index_elements=[Request.draft_id])
+                .returning(Request.id)
             )
-            sess.add(req_obj)
-            await sess.commit()
+            created = req_id is not None
+            if created:
+                await counters.track_requests(
+                    sess, [(values["category"], values["priority"], None, RequestStatus.OPEN)]
+                )
+                await events.publish(sess, "request_created", id=req_id, user_id=draft["user_id"])
+                await sess.commit()
+            else:
+                req_id = await sess.scalar(select(Request.id).where(Request.draft_id == did))
 
         DRAFTS.pop(did, None)
-        await bot.edit_message_text("✅ Заявка создана!", call.message.chat.id, call.message.id)
-        if admin_id:
+        try:
+            await bot.edit_message_text("✅ Заявка создана!", call.message.chat.id, call.message.id)
+        except ApiTelegramException as e:
+            # второе нажатие: сообщение уже отредактировано первым
+            if "message is not modified" not in str(e):
+                raise
+        if admin_id and created:
             await bot.send_message(
                 admin_id,
-                f"Новая заявка #{req_obj.id}\n"
-                f"Категория: {req_obj.category}\n"
-                f"Заголовок: {req_obj.title}\n"
-                f"Приоритет: {req_obj.priority}"
-            )
\ No newline at end of file
+                f"Новая заявка #{req_id}\n"
+                f"Категория: {values['category']}\n"
+                f"Заголовок: {values['title']}\n"
+                f"Приоритет: {values['priority']}"
+            )
+            if draft_photos:
+                await send_photos(bot, admin_id, [
+                    p["file_id"] if isinstance(p, dict) else p for p in draft_photos
+                ])
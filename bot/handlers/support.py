@@ -1,25 +1,49 @@
 # bot/handlers/support.py
+import asyncio
 import logging
+import os
 from datetime import datetime
-from typing import List, Dict
+from collections import defaultdict
+from typing import List, Dict, Set
 
 from telebot.async_telebot import AsyncTeleBot, types
-from sqlalchemy import select
+from telebot.asyncio_helper import ApiTelegramException
+from sqlalchemy import literal, select
 
+from bot.albums import MEDIA_GROUP_LIMIT, send_photos
+from bot.idlists import parse_ids, MAX_IDS
+from bot.notify import send_batched
+from db import bulk, counters, events, photos
+from db.batcher import MESSAGES
 from db.database import AsyncSessionLocal
 from db.models import (
     Request,
     RequestStatus,
-    Message,
-    User,
+    EquipmentStatus,
 )
 
 logger = logging.getLogger(__name__)
 
 WAIT_QUESTION: Dict[int, int] = {}   # admin_id   -> request_id
 WAIT_ANSWER:   Dict[int, int] = {}   # courier_id -> request_id
+SELECTED:      Dict[int, Set[int]] = {}   # chat_id -> выбранные заявки (режим выбора)
+OPEN_DASHBOARDS: Dict[int, tuple[int, int]] = {}   # chat_id -> (message_id, page)
 REQ_PER_PAGE = 10
 
+# перерисовывать открытые дашборды по событиям шины (db.events)
+LIVE_DASHBOARD = os.getenv("LIVE_DASHBOARD", "1") == "1"
+LIVE_REFRESH_DELAY = 1.0   # сек., серия событий склеивается в одно обновление
+
+BULK_USAGE = (
+    "Использование:\n"
+    "/bulk close <фильтр>\n"
+    "/bulk status <open|in_progress|need_info|closed> <фильтр>\n"
+    "/bulk assign <ID курьера> <фильтр>\n\n"
+    "Фильтр: ID и диапазоны (12 15-40), status=<статус>, "
+    "user=<ID курьера>, before=<ГГГГ-ММ-ДД>\n"
+    "Пример: /bulk close 120-380 status=open"
+)
+
 
 async def show_support_dashboard(bot: AsyncTeleBot, message: types.Message):
     await _send_request_page(bot, message.chat.id, None, page=0, edit=False)
@@ -27,6 +51,18 @@ async def show_support_dashboard(bot: AsyncTeleBot, message: types.Message):
 
 def register_support_handlers(bot: AsyncTeleBot, admin_ids: List[int]):
 
+    # ───── Статистика ─────
+    @bot.message_handler(commands=["stats"])
+    async def stats_cmd(msg: types.Message):
+        if msg.from_user.id not in admin_ids:
+            return await bot.reply_to(msg, "⛔ Недостаточно прав")
+        async with AsyncSessionLocal() as sess:
+            if msg.text.split()[1:2] == ["rebuild"]:
+                await counters.rebuild(sess)
+                await sess.commit()
+            cnt = await counters.read(sess)
+        await bot.send_message(msg.chat.id, _stats_text(cnt), parse_mode="Markdown")
+
     # ───── Dashboard ─────
     @bot.callback_query_handler(lambda c: c.data.startswith("req_pg:"))
     async def _paginate(call: types.CallbackQuery):
@@ -36,9 +72,99 @@ def register_support_handlers(bot: AsyncTeleBot, admin_ids: List[int]):
 
     @bot.callback_query_handler(lambda c: c.data == "req_dash_close")
     async def _dash_close(call: types.CallbackQuery):
+        OPEN_DASHBOARDS.pop(call.message.chat.id, None)
+        SELECTED.pop(call.message.chat.id, None)
         await bot.answer_callback_query(call.id)
         await bot.edit_message_reply_markup(call.message.chat.id, call.message.id, reply_markup=None)
 
+    # ───── Живое обновление ─────
+    refreshing: Set[int] = set()
+
+    async def _live_refresh(_event):
+        targets = [c for c in OPEN_DASHBOARDS if c not in refreshing]
+        if not targets:
+            return
+        refreshing.update(targets)
+        await asyncio.sleep(LIVE_REFRESH_DELAY)
+        for chat_id in targets:
+            refreshing.discard(chat_id)
+            entry = OPEN_DASHBOARDS.get(chat_id)
+            if not entry:
+                continue
+            msg_id, page = entry
+            try:
+                await _send_request_page(bot, chat_id, msg_id, page, edit=True)
+            except ApiTelegramException as e:
+                if "message is not modified" not in str(e):
+                    logger.info("Dashboard %s is gone: %s", chat_id, e)
+                    OPEN_DASHBOARDS.pop(chat_id, None)
+
+    if LIVE_DASHBOARD:
+        for kind in ("request_created", "request_changed", "resync"):
+            events.subscribe(kind, _live_refresh)
+
+    # ───── Множественный выбор ─────
+    @bot.callback_query_handler(lambda c: c.data.startswith("req_selmode:"))
+    async def _select_mode(call: types.CallbackQuery):
+        if call.from_user.id not in admin_ids:
+            return await bot.answer_callback_query(call.id, "⛔ Недостаточно прав")
+        page = int(call.data.split(":", 1)[1])
+        chat_id = call.message.chat.id
+        if SELECTED.pop(chat_id, None) is None:
+            SELECTED[chat_id] = set()
+        await bot.answer_callback_query(call.id)
+        await _send_request_page(bot, chat_id, call.message.id, page, edit=True)
+
+    @bot.callback_query_handler(lambda c: c.data.startswith("req_sel:"))
+    async def _select_toggle(call: types.CallbackQuery):
+        if call.from_user.id not in admin_ids:
+            return await bot.answer_callback_query(call.id, "⛔ Недостаточно прав")
+        _, req_id, page = call.data.split(":", 2)
+        selected = SELECTED.get(call.message.chat.id)
+        if selected is None:
+            return await bot.answer_callback_query(call.id, "Режим выбора выключен")
+        selected ^= {int(req_id)}
+        await bot.answer_callback_query(call.id)
+        await _send_request_page(bot, call.message.chat.id, call.message.id, int(page), edit=True)
+
+    @bot.callback_query_handler(lambda c: c.data.startswith("req_bulk:"))
+    async def _select_apply(call: types.CallbackQuery):
+        if call.from_user.id not in admin_ids:
+            return await bot.answer_callback_query(call.id, "⛔ Недостаточно прав")
+        _, status, page = call.data.split(":", 2)
+        ids = sorted(SELECTED.pop(call.message.chat.id, set()))
+        if not ids:
+            return await bot.answer_callback_query(call.id, "Ничего не выбрано")
+        await bot.answer_callback_query(call.id)
+        report = await _apply_bulk(bot, ids, status=RequestStatus(status))
+        await _send_request_page(bot, call.message.chat.id, call.message.id, int(page), edit=True)
+        await bot.send_message(call.message.chat.id, report)
+
+    @bot.message_handler(commands=["bulk"])
+    async def bulk_cmd(msg: types.Message):
+        if msg.from_user.id not in admin_ids:
+            return await bot.reply_to(msg, "⛔ Недостаточно прав")
+        args = msg.text.split()[1:]
+        try:
+            action = args.pop(0)
+            if action == "close":
+                kwargs = {"status": RequestStatus.CLOSED}
+            elif action == "status":
+                kwargs = {"status": RequestStatus(args.pop(0))}
+            elif action == "assign":
+                kwargs = {"assign_to": int(args.pop(0))}
+            else:
+                raise ValueError
+            ids = await _filter_request_ids(args)
+        except IndexError:
+            return await bot.reply_to(msg, BULK_USAGE)
+        except ValueError as e:
+            return await bot.reply_to(msg, f"⚠️ {e}\n\n{BULK_USAGE}" if str(e) else BULK_USAGE)
+
+        if not ids:
+            return await bot.reply_to(msg, "Под фильтр не попала ни одна заявка.")
+        await bot.reply_to(msg, await _apply_bulk(bot, ids, **kwargs))
+
     @bot.callback_query_handler(lambda c: c.data.startswith("req_card:"))
     async def _card(call: types.CallbackQuery):
         req_id = int(call.data.split(":", 1)[1])
@@ -49,6 +175,11 @@ def register_support_handlers(bot: AsyncTeleBot, admin_ids: List[int]):
 
         kb = types.InlineKeyboardMarkup()
         kb.add(types.InlineKeyboardButton("💬 Вопрос курьеру", callback_data=f"req_ask:{req_id}"))
+        if req.photos:
+            # фото не шлём вместе с карточкой — только по запросу
+            kb.add(types.InlineKeyboardButton(f"🖼 Фото ({len(req.photos)})", callback_data=f"req_ph:{req_id}:0"))
+        if req.status != RequestStatus.CLOSED:
+            kb.add(types.InlineKeyboardButton("✔️ Закрыть заявку", callback_data=f"req_close:{req_id}"))
 
         txt = (
             f"*Заявка #{req.id}*\n"
@@ -59,6 +190,51 @@ def register_support_handlers(bot: AsyncTeleBot, admin_ids: List[int]):
         await bot.answer_callback_query(call.id)
         await bot.send_message(call.from_user.id, txt, parse_mode="Markdown", reply_markup=kb)
 
+    @bot.callback_query_handler(lambda c: c.data.startswith(("req_ph:", "req_phf:")))
+    async def _card_photos(call: types.CallbackQuery):
+        # req_ph — превью (наименьший PhotoSize), req_phf — оригиналы той же страницы;
+        # страница — одна медиагруппа
+        if call.from_user.id not in admin_ids:
+            return await bot.answer_callback_query(call.id, "⛔ Недостаточно прав")
+        action, req_id, page = call.data.split(":")
+        req_id, page = int(req_id), int(page)
+        async with AsyncSessionLocal() as sess:
+            keys = await sess.scalar(select(Request.photos).where(Request.id == req_id))
+            if not keys:
+                return await bot.answer_callback_query(call.id, "Фото нет")
+            start = page * MEDIA_GROUP_LIMIT
+            chunk = keys[start:start + MEDIA_GROUP_LIMIT]
+            file_ids = await photos.resolve(sess, chunk, thumbs=action == "req_ph")
+        await bot.answer_callback_query(call.id)
+        if not file_ids:
+            return
+        await send_photos(bot, call.from_user.id, file_ids)
+
+        pages = -(-len(keys) // MEDIA_GROUP_LIMIT)
+        kb = types.InlineKeyboardMarkup()
+        row = []
+        if action == "req_ph":
+            row.append(types.InlineKeyboardButton("🔍 Оригиналы", callback_data=f"req_phf:{req_id}:{page}"))
+        if page + 1 < pages:
+            row.append(types.InlineKeyboardButton("▶️ Ещё фото", callback_data=f"req_ph:{req_id}:{page + 1}"))
+        if row:
+            kb.row(*row)
+            await bot.send_message(
+                call.from_user.id,
+                f"Заявка #{req_id}: фото {start + 1}–{start + len(file_ids)} из {len(keys)}",
+                reply_markup=kb,
+            )
+
+    @bot.callback_query_handler(lambda c: c.data.startswith("req_close:"))
+    async def _card_close(call: types.CallbackQuery):
+        if call.from_user.id not in admin_ids:
+            return await bot.answer_callback_query(call.id, "⛔ Недостаточно прав")
+        req_id = int(call.data.split(":", 1)[1])
+        await bot.answer_callback_query(call.id)
+        await _apply_bulk(bot, [req_id], status=RequestStatus.CLOSED)
+        await bot.edit_message_reply_markup(call.message.chat.id, call.message.id, reply_markup=None)
+        await bot.send_message(call.message.chat.id, f"Заявка #{req_id} закрыта ✅")
+
     # ───── Вопрос саппорта ─────
     @bot.callback_query_handler(lambda c: c.data.startswith("req_ask:"))
     async def ask_click(call: types.CallbackQuery):
@@ -75,20 +251,16 @@ def register_support_handlers(bot: AsyncTeleBot, admin_ids: List[int]):
         req_id = WAIT_QUESTION.pop(msg.from_user.id)
         text = msg.text.strip()
 
-        async with AsyncSessionLocal() as sess:
-            req = await sess.get(Request, req_id)
-            if not req:
-                return await bot.reply_to(msg, "⚠️ Заявка не найдена")
-
-            sess.add(Message(
-                request_id=req_id,
-                from_user=msg.from_user.id,
-                to_user=req.user_id,
-                text=text,
-                created_at=datetime.utcnow(),
-            ))
-            req.status = RequestStatus.NEED_INFO
-            await sess.commit()
+        req = await _set_status(req_id, RequestStatus.NEED_INFO)
+        if not req:
+            return await bot.reply_to(msg, "⚠️ Заявка не найдена")
+        MESSAGES.add(
+            request_id=req_id,
+            from_user=msg.from_user.id,
+            to_user=req.user_id,
+            text=text,
+            created_at=datetime.utcnow(),
+        )
 
         kb = types.InlineKeyboardMarkup()
         kb.add(types.InlineKeyboardButton("💬 Ответить", callback_data=f"req_ans:{req_id}"))
@@ -113,53 +285,71 @@ def register_support_handlers(bot: AsyncTeleBot, admin_ids: List[int]):
         req_id = WAIT_ANSWER.pop(msg.from_user.id)
         text = msg.text.strip()
 
-        async with AsyncSessionLocal() as sess:
-            req = await sess.get(Request, req_id)
-            if not req:
-                return await bot.reply_to(msg, "⚠️ Заявка не найдена")
-
-            for adm in admin_ids:
-                sess.add(Message(
-                    request_id=req_id,
-                    from_user=msg.from_user.id,
-                    to_user=adm,
-                    text=text,
-                    created_at=datetime.utcnow(),
-                ))
-            req.status = RequestStatus.IN_PROGRESS
-            await sess.commit()
-
+        req = await _set_status(req_id, RequestStatus.IN_PROGRESS)
+        if not req:
+            return await bot.reply_to(msg, "⚠️ Заявка не найдена")
         for adm in admin_ids:
-            await bot.send_message(
-                adm,
-                f"💬 *Ответ по заявке #{req_id}*\n\n{text}",
-                parse_mode="Markdown",
+            MESSAGES.add(
+                request_id=req_id,
+                from_user=msg.from_user.id,
+                to_user=adm,
+                text=text,
+                created_at=datetime.utcnow(),
             )
+
+        await send_batched(
+            bot,
+            {adm: [f"💬 *Ответ по заявке #{req_id}*\n\n{text}"] for adm in admin_ids},
+            parse_mode="Markdown",
+        )
         await bot.reply_to(msg, "Ответ отправлен ✅")
 
 
 # ───── helpers ─────
+# литерал, а не параметр: так планировщик сопоставит условие с частичным
+# индексом ix_requests_active и не тронет закрытые заявки
+_NOT_CLOSED = Request.status != literal(RequestStatus.CLOSED, Request.status.type,
+                                        literal_execute=True)
+
+
+async def _set_status(req_id: int, status: RequestStatus) -> Request | None:
+    """Меняет статус одной заявки; если он уже такой — ничего не пишет."""
+    async with AsyncSessionLocal() as sess:
+        # старый статус — под блокировкой, иначе параллельная смена собьёт счётчики
+        req = await sess.get(Request, req_id, with_for_update=True)
+        if req and req.status != status:
+            await counters.track_requests(sess, [(req.category, req.priority, req.status, status)])
+            req.status = status
+            await events.publish(sess, "request_changed", ids=[req_id], user_ids=[req.user_id])
+            await sess.commit()
+    return req
+
+
 async def _send_request_page(bot: AsyncTeleBot, chat_id: int, msg_id: int | None, page: int, edit=False):
     async with AsyncSessionLocal() as sess:
+        count = await counters.total(sess, counters.ACTIVE_KEYS)
+        total = max(1, (count + REQ_PER_PAGE - 1) // REQ_PER_PAGE)
+        page = max(0, min(page, total - 1))
         items = (
             await sess.execute(
                 select(Request)
-                .where(Request.status.in_([RequestStatus.OPEN,
-                                           RequestStatus.NEED_INFO,
-                                           RequestStatus.IN_PROGRESS]))
+                .where(_NOT_CLOSED)
                 .order_by(Request.created_at.desc())
+                .offset(page * REQ_PER_PAGE).limit(REQ_PER_PAGE)
             )
         ).scalars().all()
 
-    total = max(1, (len(items) + REQ_PER_PAGE - 1) // REQ_PER_PAGE)
-    page = max(0, min(page, total - 1))
-    start, end = page * REQ_PER_PAGE, (page + 1) * REQ_PER_PAGE
-
+    selected = SELECTED.get(chat_id)
     kb = types.InlineKeyboardMarkup()
-    for r in items[start:end]:
+    for r in items:
         cat = r.category if len(r.category) <= 18 else r.category[:15] + "…"
-        kb.add(types.InlineKeyboardButton(f"#{r.id} • {cat} • {r.status.value}",
-                                          callback_data=f"req_card:{r.id}"))
+        label = f"#{r.id} • {cat} • {r.status.value}"
+        if selected is None:
+            kb.add(types.InlineKeyboardButton(label, callback_data=f"req_card:{r.id}"))
+        else:
+            mark = "✅" if r.id in selected else "▫️"
+            kb.add(types.InlineKeyboardButton(f"{mark} {label}",
+                                              callback_data=f"req_sel:{r.id}:{page}"))
 
     nav = []
     if page > 0:
@@ -168,6 +358,15 @@ async def _send_request_page(bot: AsyncTeleBot, chat_id: int, msg_id: int | None
         nav.append(types.InlineKeyboardButton("▶️", callback_data=f"req_pg:{page+1}"))
     if nav:
         kb.row(*nav)
+    if selected is None:
+        kb.add(types.InlineKeyboardButton("☑️ Выбрать несколько", callback_data=f"req_selmode:{page}"))
+    else:
+        n = len(selected)
+        kb.row(
+            types.InlineKeyboardButton(f"✔️ Закрыть ({n})", callback_data=f"req_bulk:closed:{page}"),
+            types.InlineKeyboardButton(f"🔧 В работу ({n})", callback_data=f"req_bulk:in_progress:{page}"),
+        )
+        kb.add(types.InlineKeyboardButton("↩️ Отменить выбор", callback_data=f"req_selmode:{page}"))
     kb.add(types.InlineKeyboardButton("❌ Закрыть", callback_data="req_dash_close"))
 
     header = f"*Заявки (стр. {page+1}/{total})*"
@@ -176,4 +375,89 @@ async def _send_request_page(bot: AsyncTeleBot, chat_id: int, msg_id: int | None
     if edit and msg_id:
         await bot.edit_message_text(text, chat_id, msg_id, reply_markup=kb, parse_mode="Markdown")
     else:
-        await bot.send_message(chat_id, text, reply_markup=kb, parse_mode="Markdown")
+        msg_id = (await bot.send_message(chat_id, text, reply_markup=kb, parse_mode="Markdown")).id
+    OPEN_DASHBOARDS[chat_id] = (msg_id, page)
+
+
+async def _filter_request_ids(tokens: List[str]) -> List[int]:
+    """ID заявок под фильтр из /bulk (без фильтра — ошибка, а не «все заявки»)."""
+    if not tokens:
+        raise ValueError("Нужен фильтр")
+    stmt = select(Request.id).order_by(Request.id).limit(MAX_IDS + 1)
+    plain = []
+    for token in tokens:
+        key, sep, value = token.partition("=")
+        if not sep:
+            plain.append(token)
+        elif key == "status":
+            stmt = stmt.where(Request.status == RequestStatus(value))
+        elif key == "user":
+            stmt = stmt.where(Request.user_id == int(value))
+        elif key == "before":
+            stmt = stmt.where(Request.created_at < datetime.strptime(value, "%Y-%m-%d"))
+        else:
+            raise ValueError(f"Неизвестный фильтр: {key}")
+    if plain:
+        stmt = stmt.where(Request.id.in_([int(x) for x in parse_ids(plain)]))
+
+    async with AsyncSessionLocal() as sess:
+        ids = (await sess.execute(stmt)).scalars().all()
+    if len(ids) > MAX_IDS:
+        raise ValueError(f"Под фильтр попало больше {MAX_IDS} заявок, сузьте его")
+    return list(ids)
+
+
+async def _apply_bulk(bot: AsyncTeleBot, ids: List[int],
+                      status: RequestStatus | None = None, assign_to: int | None = None) -> str:
+    """Одна транзакция на весь набор, затем пакетные уведомления курьерам."""
+    notify: Dict[int, List[str]] = defaultdict(list)
+    async with AsyncSessionLocal() as sess:
+        if status is not None:
+            rows = await bulk.set_request_status(sess, ids, status)
+            for r in rows:
+                notify[r.user_id].append(f"#{r.id} — {status.value}")
+            header = "ℹ️ Статус ваших заявок изменён:"
+        else:
+            rows = await bulk.reassign_requests(sess, ids, assign_to)
+            notify[assign_to] = [f"#{r.id}" for r in rows]
+            header = "📌 Вам переданы заявки:"
+        await sess.commit()
+
+    if rows:
+        await send_batched(bot, notify, header=header)
+    skipped = bulk.missing(ids, [r.id for r in rows])
+    report = f"✅ Изменено заявок: {len(rows)} из {len(ids)}"
+    if skipped:
+        shown = ", ".join(f"#{x}" for x in skipped[:20])
+        report += f"\nБез изменений: {shown}" + (" …" if len(skipped) > 20 else "")
+    return report
+
+
+EQ_LABELS = {
+    EquipmentStatus.IN_STOCK:     "🟢 На складе",
+    EquipmentStatus.WITH_COURIER: "🚴 У курьеров",
+    EquipmentStatus.NEED_REPAIR:  "🛠️ В ремонте",
+}
+
+
+def _stats_text(cnt: Dict[str, int]) -> str:
+    lines = ["*Оборудование*"]
+    for st, label in EQ_LABELS.items():
+        lines.append(f"{label}: {cnt.get(counters.eq_key(st), 0)}")
+
+    lines.append("\n*Заявки*")
+    for st in RequestStatus:
+        label = st.value.replace("_", "\\_")   # Markdown
+        lines.append(f"{label}: {cnt.get(counters.req_key(st), 0)}")
+    lines.append(f"в архиве: {cnt.get(counters.ARCHIVED_KEY, 0)}")
+
+    for title, prefix in (("по категориям", "req_cat:"), ("по приоритетам", "req_prio:")):
+        rows = sorted(
+            ((k[len(prefix):], v) for k, v in cnt.items() if k.startswith(prefix) and v),
+            key=lambda kv: -kv[1],
+        )
+        lines.append(f"\n*Открытые {title}*")
+        lines.extend(f"{name}: {v}" for name, v in rows)
+        if not rows:
+            lines.append("_нет_")
+    return "\n".join(lines)
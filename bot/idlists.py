@@ -0,0 +1,33 @@
+# bot/idlists.py
+"""Разбор списков ID из команд: «12 15-40 0001-0010 BK-7»."""
+from typing import Iterable, List
+
+MAX_IDS = 5000
+
+
+def parse_ids(tokens: Iterable[str], limit: int = MAX_IDS) -> List[str]:
+    """
+    Диапазон «A-B» раскрывается, только если обе границы — числа;
+    ведущие нули сохраняются (0001-0003 → 0001, 0002, 0003).
+    Остальные токены берутся как есть. Порядок сохраняется, дубли убираются.
+    """
+    out: dict[str, None] = {}
+    for token in tokens:
+        for part in token.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            lo, sep, hi = part.partition("-")
+            if sep and lo.isdigit() and hi.isdigit():
+                a, b = int(lo), int(hi)
+                if b < a:
+                    raise ValueError(f"Пустой диапазон: {part}")
+                if b - a + 1 > limit:
+                    raise ValueError(f"Слишком большой диапазон: {part}")
+                for n in range(a, b + 1):
+                    out[str(n).zfill(len(lo))] = None
+            else:
+                out[part] = None
+            if len(out) > limit:
+                raise ValueError(f"Не больше {limit} ID за раз")
+    return list(out)
@@ -0,0 +1,186 @@
+# bot/lifecycle.py
+"""
+Запуск и корректная остановка бота.
+
+По SIGTERM/SIGINT: перестаём забирать апдейты, ждём (с дедлайном)
+уже запущенные обработчики вместе с их исходящими сообщениями,
+сбрасываем буфер пакетной записи, сохраняем черновики, закрываем
+пул соединений и HTTP-сессию.
+
+Polling реализован здесь, а не через infinity_polling: тот по выходу
+закрывает общую aiohttp-сессию, и недоработавшие обработчики теряют
+свои send_message.
+"""
+import asyncio
+import logging
+import os
+import signal
+import time
+from collections import deque
+
+from telebot.async_telebot import AsyncTeleBot
+
+from db import events
+from db.archive import archive_loop
+from db.batcher import MESSAGES
+from db.database import engine
+from bot.state import flush_drafts
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT     = 20                                        # long polling, сек.
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "20"))  # на дренаж, сек.
+
+_INFLIGHT: set[asyncio.Task] = set()
+
+
+def _track(task: asyncio.Task) -> asyncio.Task:
+    _INFLIGHT.add(task)
+    task.add_done_callback(_INFLIGHT.discard)
+    return task
+
+
+def dispatch(bot: AsyncTeleBot, updates) -> asyncio.Task:
+    """Запускает обработку пачки апдейтов и запоминает задачу до её завершения."""
+    return _track(asyncio.create_task(bot.process_new_updates(updates)))
+
+
+def _media_group(update) -> str | None:
+    return update.message.media_group_id if update.message is not None else None
+
+
+class UserLanes:
+    """
+    Апдейты каждого пользователя по очереди: следующий — после завершения
+    предыдущего (process_new_updates обрабатывает пачку параллельно).
+
+    Исключение — альбом: пока первое фото ждёт остальные в collect_album,
+    фото с той же media_group_id (в том числе из следующих пачек) запускаются
+    сразу, иначе они дойдут до хендлера, когда альбом уже собран.
+    on_step(ms, n) вызывается по завершении каждого шага — для метрик.
+    """
+
+    def __init__(self, bot: AsyncTeleBot, on_step=None):
+        self.bot = bot
+        self.on_step = on_step
+        self._pending: dict[int, deque] = {}
+        self._wake: dict[int, asyncio.Event] = {}
+
+    def push(self, user_id: int, updates):
+        if user_id in self._pending:
+            self._pending[user_id].extend(updates)
+            self._wake[user_id].set()
+            return
+        self._pending[user_id] = deque(updates)
+        self._wake[user_id] = asyncio.Event()
+        _track(asyncio.create_task(self._run(user_id)))
+
+    async def _run(self, user_id: int):
+        pending, wake = self._pending[user_id], self._wake[user_id]
+        step: list[asyncio.Task] = []
+        try:
+            while pending:
+                started = time.monotonic()
+                update = pending.popleft()
+                group = _media_group(update)
+                step = [dispatch(self.bot, [update])]
+                while group is not None:
+                    while pending and _media_group(pending[0]) == group:
+                        step.append(dispatch(self.bot, [pending.popleft()]))
+                    running = [t for t in step if not t.done()]
+                    if not running:
+                        break
+                    wake.clear()
+                    waiter = asyncio.create_task(wake.wait())
+                    try:
+                        await asyncio.wait([*running, waiter], return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        waiter.cancel()
+                await asyncio.gather(*step, return_exceptions=True)
+                if self.on_step:
+                    self.on_step((time.monotonic() - started) * 1000, len(step))
+        except asyncio.CancelledError:
+            # дренаж на остановке отменил очередь — отменяем и её текущий шаг
+            for task in step:
+                task.cancel()
+            raise
+        finally:
+            del self._pending[user_id], self._wake[user_id]
+
+
+def in_flight() -> int:
+    return len(_INFLIGHT)
+
+
+async def _poll(bot: AsyncTeleBot):
+    me = await bot.get_me()
+    logger.info("Polling as @%s", me.username)
+    while True:
+        try:
+            updates = await bot.get_updates(offset=bot.offset, timeout=POLL_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Polling error: %s", e)
+            await asyncio.sleep(3)
+            continue
+        if updates:
+            bot.offset = updates[-1].update_id + 1
+            dispatch(bot, updates)
+
+
+async def drain(timeout: float) -> int:
+    """Ждёт обработчики не дольше timeout. Возвращает число прерванных."""
+    if not _INFLIGHT:
+        return 0
+    _, pending = await asyncio.wait(set(_INFLIGHT), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return len(pending)
+
+
+async def shutdown(bot: AsyncTeleBot, poller: asyncio.Task | None = None):
+    logger.info("🛑 Shutting down: %d update batches in flight", len(_INFLIGHT))
+    if poller:
+        poller.cancel()
+        await asyncio.gather(poller, return_exceptions=True)
+        # подтверждаем Telegram всё уже полученное, чтобы следующий
+        # экземпляр не обработал эти апдейты повторно
+        try:
+            await bot.get_updates(offset=bot.offset, limit=1, timeout=0)
+        except Exception as e:
+            logger.warning("Failed to confirm offset %s: %s", bot.offset, e)
+
+    dropped = await drain(SHUTDOWN_TIMEOUT)
+    try:
+        await MESSAGES.close()
+    except Exception:
+        logger.exception("Failed to flush buffered messages")
+    try:
+        saved = await flush_drafts()
+    except Exception:
+        logger.exception("Failed to flush drafts")
+        saved = 0
+    await events.stop()
+    await engine.dispose()
+    await bot.close_session()
+    logger.info("✅ Stopped: %d drafts saved, %d update batches dropped", saved, dropped)
+
+
+async def serve(bot: AsyncTeleBot):
+    """Polling до сигнала остановки, затем shutdown()."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    poller = asyncio.create_task(_poll(bot))
+    archiver = asyncio.create_task(archive_loop())
+    stopper = asyncio.create_task(stop.wait())
+    await asyncio.wait({poller, stopper}, return_when=asyncio.FIRST_COMPLETED)
+    stopper.cancel()
+    archiver.cancel()
+    await asyncio.gather(archiver, return_exceptions=True)
+    await shutdown(bot, poller)
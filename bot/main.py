@@ -7,6 +7,11 @@ from telebot.async_telebot import AsyncTeleBot
 
 # DB init
 from db.database import init_db
+from db import counters, events
+
+from bot.dedup import DedupMiddleware
+from bot.lifecycle import serve
+from bot.state import restore_drafts
 
 # Handlers
 from bot.handlers.basic import register_basic_handlers
@@ -22,6 +27,7 @@ if not BOT_TOKEN:
 
 ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
 ADMIN_IDS = [767221819] 
+WORKERS = int(os.getenv("WORKERS", "1"))   # >1 — intake + N процессов-обработчиков
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,10 +35,9 @@ logger = logging.getLogger(__name__)
 
 bot = AsyncTeleBot(BOT_TOKEN)
 
-async def main():
-    await init_db()
-    logger.info("✅ Database initialized")
-
+async def setup(shard: tuple[int, int] | None = None):
+    """Регистрирует обработчики и поднимает сохранённые черновики (только своего шарда)."""
+    bot.setup_middleware(DedupMiddleware())
     register_basic_handlers(bot)
     register_request_handlers(bot, ADMIN_ID)
     register_equipment_handlers(bot, ADMIN_ID)
@@ -40,7 +45,25 @@ async def main():
     register_support_handlers(bot, ADMIN_IDS)
     logger.info("🔌 Handlers registered")
 
-    await bot.infinity_polling()
+    # кэши этого процесса сбрасываются по записям любого процесса
+    events.subscribe("*", counters.invalidate)
+    await events.start()
+
+    restored = await restore_drafts(shard)
+    if restored:
+        logger.info("♻️ Restored %d drafts", restored)
+
+async def main():
+    await init_db()
+    logger.info("✅ Database initialized")
+
+    if WORKERS > 1:
+        from bot.workers import run_intake
+        await run_intake(BOT_TOKEN, WORKERS)
+        return
+
+    await setup()
+    await serve(bot)
 
 if __name__ == "__main__":
     asyncio.run(main())
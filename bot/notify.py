@@ -0,0 +1,43 @@
+# bot/notify.py
+"""
+Массовая рассылка уведомлений: одно сообщение на получателя,
+отправка пачками, чтобы не упираться в лимит Telegram (~30 сообщений/с).
+"""
+import asyncio
+import logging
+from typing import Dict, List
+
+from telebot import util
+from telebot.async_telebot import AsyncTeleBot
+
+logger = logging.getLogger(__name__)
+
+SEND_RATE = 25   # сообщений в секунду
+
+
+async def send_batched(bot: AsyncTeleBot, lines: Dict[int, List[str]], header: str = "",
+                       **kwargs) -> int:
+    """
+    lines: chat_id -> строки для этого получателя. Строки одного получателя
+    склеиваются в одно сообщение (с разбиением по лимиту длины).
+    Возвращает число неудачных отправок.
+    """
+    outbox = []
+    for chat_id, rows in lines.items():
+        text = "\n".join([header, *rows] if header else rows)
+        outbox.extend((chat_id, part) for part in util.smart_split(text))
+
+    failed = 0
+    for i in range(0, len(outbox), SEND_RATE):
+        if i:
+            await asyncio.sleep(1)
+        chunk = outbox[i:i + SEND_RATE]
+        results = await asyncio.gather(
+            *(bot.send_message(chat_id, text, **kwargs) for chat_id, text in chunk),
+            return_exceptions=True,
+        )
+        for (chat_id, _), res in zip(chunk, results):
+            if isinstance(res, Exception):
+                failed += 1
+                logger.warning("Notification to %s failed: %s", chat_id, res)
+    return failed
@@ -0,0 +1,70 @@
+# bot/state.py
+"""
+Сохранение диалогового состояния (черновики, ожидание вопроса/ответа)
+в таблицу drafts при остановке и восстановление при старте.
+"""
+import logging
+
+from sqlalchemy import delete, select
+
+from db.database import AsyncSessionLocal
+from db.models import Draft
+from bot.handlers.requests import DRAFTS
+from bot.handlers.equipment import EQUIP_DRAFTS
+from bot.handlers.support import WAIT_QUESTION, WAIT_ANSWER
+
+logger = logging.getLogger(__name__)
+
+
+def _snapshot() -> list[Draft]:
+    rows = []
+    for did, d in DRAFTS.items():
+        rows.append(Draft(id=did, kind="request", user_id=d["user_id"], data=d))
+    for did, d in EQUIP_DRAFTS.items():
+        rows.append(Draft(id=did, kind="equipment", user_id=d["user_id"], data=d))
+    for uid, req_id in WAIT_QUESTION.items():
+        rows.append(Draft(id=f"wq:{uid}", kind="wait_question", user_id=uid, data={"request_id": req_id}))
+    for uid, req_id in WAIT_ANSWER.items():
+        rows.append(Draft(id=f"wa:{uid}", kind="wait_answer", user_id=uid, data={"request_id": req_id}))
+    return rows
+
+
+async def flush_drafts() -> int:
+    """Записывает всё незавершённое в БД. Возвращает число записей."""
+    rows = _snapshot()
+    if not rows:
+        return 0
+    async with AsyncSessionLocal() as sess:
+        for row in rows:
+            await sess.merge(row)
+        await sess.commit()
+    return len(rows)
+
+
+async def restore_drafts(shard: tuple[int, int] | None = None) -> int:
+    """
+    Поднимает сохранённое состояние в память и удаляет его из таблицы.
+    shard=(i, n) — только пользователи этого процесса-обработчика (user_id % n == i).
+    """
+    stmt = select(Draft)
+    if shard is not None:
+        idx, n = shard
+        stmt = stmt.where(Draft.user_id % n == idx)
+    async with AsyncSessionLocal() as sess:
+        rows = (await sess.execute(stmt)).scalars().all()
+        if not rows:
+            return 0
+        for row in rows:
+            if row.kind == "request":
+                DRAFTS[row.id] = row.data
+            elif row.kind == "equipment":
+                EQUIP_DRAFTS[row.id] = row.data
+            elif row.kind == "wait_question":
+                WAIT_QUESTION[row.user_id] = row.data["request_id"]
+            elif row.kind == "wait_answer":
+                WAIT_ANSWER[row.user_id] = row.data["request_id"]
+            else:
+                logger.warning("Unknown draft kind %s (%s)", row.kind, row.id)
+        await sess.execute(delete(Draft).where(Draft.id.in_([r.id for r in rows])))
+        await sess.commit()
+    return len(rows)
@@ -0,0 +1,298 @@
+# bot/workers.py
+"""
+Многопроцессный режим (WORKERS > 1).
+
+Intake-процесс забирает апдейты через getUpdates и раскладывает их по
+очередям N процессов-обработчиков по from.id % N. У каждого обработчика
+свой event loop, свой пул соединений и свой набор хендлеров. Все апдейты
+одного пользователя попадают в один процесс, поэтому его черновики и
+ожидания ответа (обычные dict в памяти) остаются согласованными. Внутри
+обработчика апдейты одного пользователя выполняются строго по очереди
+(кроме фото одного альбома — их собирает collect_album), разные
+пользователи — параллельно.
+
+Intake следит за обработчиками: упавший или переставший присылать
+heartbeat процесс перезапускается с новой очередью (у старой мог остаться
+захваченный убитым процессом замок чтения), а недоставленные апдейты
+перекладываются в неё.
+
+Ограничение: диалоговое состояние (черновики, ожидание вопроса/ответа,
+недособранные альбомы) живёт в памяти обработчика и пишется в drafts
+только при штатной остановке. Если обработчик упал или убит супервизором,
+незавершённые диалоги его шарда и уже взятые им из очереди апдейты
+(их offset подтверждён) теряются — в лог пишется оценка по последнему
+heartbeat.
+Метрики каждого обработчика приходят вместе с heartbeat и пишутся в лог.
+
+Каждый процесс держит свой пул (по умолчанию до 15 соединений), так что
+N ограничено max_connections Postgres.
+"""
+import asyncio
+import logging
+import multiprocessing as mp
+import queue
+import signal
+import time
+from multiprocessing.reduction import ForkingPickler
+
+from telebot import asyncio_helper, types
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT      = 20   # long polling, сек.
+HEARTBEAT_EVERY   = 10   # как часто обработчик присылает метрики, сек.
+HEARTBEAT_TIMEOUT = 60   # после такой тишины обработчик перезапускается, сек.
+SUPERVISE_EVERY   = 5    # период проверки обработчиков, сек.
+QUEUE_WAIT        = 1.0  # таймаут чтения очереди: поток executor не висит вечно, сек.
+
+_ctx = mp.get_context("spawn")   # чистый процесс: свой engine, свой loop
+
+
+def _user_of(update: dict) -> int | None:
+    for body in update.values():
+        if isinstance(body, dict) and "from" in body:
+            return body["from"]["id"]
+    return None
+
+
+def shard_of(update: dict, workers: int) -> int:
+    """Номер обработчика для сырого апдейта: по from.id, иначе по update_id."""
+    user_id = _user_of(update)
+    return (user_id if user_id is not None else update["update_id"]) % workers
+
+
+def _take(updates: mp.Queue) -> list:
+    """Всё, что накопилось в очереди (ждёт первый апдейт не дольше QUEUE_WAIT)."""
+    try:
+        raw = [updates.get(timeout=QUEUE_WAIT)]
+    except queue.Empty:
+        return []
+    while True:
+        try:
+            raw.append(updates.get_nowait())
+        except queue.Empty:
+            return raw
+
+
+# ───────────────────────────── обработчик ─────────────────────────────
+class _ErrorCounter:
+    """exception_handler для AsyncTeleBot: считает и логирует ошибки хендлеров."""
+
+    def __init__(self):
+        self.count = 0
+
+    def handle(self, exception):
+        self.count += 1
+        logger.error("Handler error: %s", exception, exc_info=exception)
+        return True
+
+
+def worker_main(idx: int, workers: int, updates: mp.Queue, metrics: mp.Queue):
+    # Ctrl+C прилетает всей группе процессов — останавливает нас только intake
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO,
+                        format=f"[worker {idx}] %(levelname)s:%(name)s:%(message)s")
+    asyncio.run(_worker(idx, workers, updates, metrics))
+
+
+async def _worker(idx: int, workers: int, updates: mp.Queue, metrics: mp.Queue):
+    from bot.main import bot, setup
+    from bot.lifecycle import UserLanes, dispatch, shutdown, in_flight
+
+    errors = _ErrorCounter()
+    bot.exception_handler = errors
+    await setup(shard=(idx, workers))
+
+    # busy_ms — сумма времени шагов обработки (каждый — от своего старта),
+    # pending — апдейты, взятые из очереди и ещё не обработанные
+    stats = {"updates": 0, "batches": 0, "pending": 0, "busy_ms": 0.0, "max_ms": 0.0}
+
+    def _step_done(ms: float, n: int):
+        stats["busy_ms"] += ms
+        stats["max_ms"] = max(stats["max_ms"], ms)
+        stats["pending"] -= n
+
+    def _done(n: int):
+        started = time.monotonic()
+        return lambda _task: _step_done((time.monotonic() - started) * 1000, n)
+
+    async def _heartbeat():
+        while True:
+            metrics.put((idx, {**stats, "errors": errors.count, "in_flight": in_flight()}))
+            stats["max_ms"] = 0.0
+            await asyncio.sleep(HEARTBEAT_EVERY)
+
+    lanes = UserLanes(bot, on_step=_step_done)
+    beat = asyncio.create_task(_heartbeat())
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        # одна пачка — всё, что уже накопилось, как при обычном polling
+        raw = await loop.run_in_executor(None, _take, updates)
+        if None in raw:   # сигнал остановки от intake
+            stopping = True
+            raw = [u for u in raw if u is not None]
+        if not raw:
+            continue
+        stats["updates"] += len(raw)
+        stats["batches"] += 1
+        stats["pending"] += len(raw)
+
+        by_user: dict[int, list] = {}
+        anonymous = []
+        for u in raw:
+            user_id = _user_of(u)
+            (by_user.setdefault(user_id, []) if user_id is not None else anonymous).append(
+                types.Update.de_json(u)
+            )
+        if anonymous:
+            dispatch(bot, anonymous).add_done_callback(_done(len(anonymous)))
+        for user_id, batch in by_user.items():
+            lanes.push(user_id, batch)
+
+    beat.cancel()
+    await shutdown(bot)
+
+
+# ─────────────────────────────── intake ───────────────────────────────
+class _Worker:
+    def __init__(self, idx: int, workers: int, metrics: mp.Queue):
+        self.idx = idx
+        self.workers = workers
+        self.metrics = metrics
+        self.updates = _ctx.Queue()
+        self.proc = None
+        self.last_beat = 0.0
+        self.last_pending = 0   # из последнего heartbeat
+        self.restarts = 0
+
+    def renew_queue(self) -> int:
+        """
+        Заменяет очередь новой и перекладывает в неё недоставленные апдейты.
+        Процесс уже остановлен: он мог умереть с захваченным замком чтения,
+        поэтому старая очередь читается напрямую из её канала.
+        """
+        old, self.updates = self.updates, _ctx.Queue()
+        moved = 0
+        try:
+            while old._reader.poll(0.1):
+                update = ForkingPickler.loads(old._reader.recv_bytes())
+                if update is not None:
+                    self.updates.put(update)
+                    moved += 1
+        except (EOFError, OSError, ValueError) as e:
+            logger.error("worker %d: queue left unreadable (%s), some updates lost", self.idx, e)
+        old.close()
+        old.cancel_join_thread()
+        return moved
+
+    def start(self):
+        self.proc = _ctx.Process(
+            target=worker_main, name=f"worker-{self.idx}",
+            args=(self.idx, self.workers, self.updates, self.metrics),
+        )
+        self.proc.start()
+        self.last_beat = time.monotonic()
+
+
+async def _supervise(pool: list[_Worker], metrics: mp.Queue):
+    while True:
+        await asyncio.sleep(SUPERVISE_EVERY)
+        while True:
+            try:
+                idx, data = metrics.get_nowait()
+            except queue.Empty:
+                break
+            pool[idx].last_beat = time.monotonic()
+            pool[idx].last_pending = data["pending"]
+            logger.info("📊 worker %d: %s", idx, data)
+
+        now = time.monotonic()
+        for w in pool:
+            if not w.proc.is_alive():
+                reason = f"exited with code {w.proc.exitcode}"
+            elif now - w.last_beat > HEARTBEAT_TIMEOUT:
+                reason = f"no heartbeat for {now - w.last_beat:.0f}s"
+                w.proc.kill()
+                w.proc.join()
+            else:
+                continue
+            w.restarts += 1
+            moved = w.renew_queue()
+            # offset этих апдейтов intake уже подтвердил — они потеряны вместе
+            # с незавершёнными диалогами шарда (drafts пишутся только в shutdown)
+            logger.error("💥 worker %d %s, restarting (#%d): %d queued updates kept, "
+                         "~%d taken updates and the shard's open drafts lost",
+                         w.idx, reason, w.restarts, moved, w.last_pending)
+            w.last_pending = 0
+            w.start()
+
+
+async def run_intake(token: str, workers: int):
+    from bot.lifecycle import SHUTDOWN_TIMEOUT
+
+    metrics = _ctx.Queue()
+    pool = [_Worker(i, workers, metrics) for i in range(workers)]
+    for w in pool:
+        w.start()
+    logger.info("🚀 Intake started with %d workers", workers)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    offset = None
+
+    async def _poll():
+        nonlocal offset
+        while True:
+            try:
+                raw = await asyncio_helper.get_updates(token, offset=offset, timeout=POLL_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Polling error: %s", e)
+                await asyncio.sleep(3)
+                continue
+            for update in raw:
+                pool[shard_of(update, workers)].updates.put(update)
+            if raw:
+                offset = raw[-1]["update_id"] + 1
+
+    from db.archive import archive_loop
+    from db.database import engine
+
+    poller = asyncio.create_task(_poll())
+    supervisor = asyncio.create_task(_supervise(pool, metrics))
+    archiver = asyncio.create_task(archive_loop())   # один на все процессы — в intake
+    stopper = asyncio.create_task(stop.wait())
+    await asyncio.wait({poller, stopper}, return_when=asyncio.FIRST_COMPLETED)
+
+    # ── остановка: больше не берём апдейты, подтверждаем полученные,
+    #    обработчики дренируют очередь и свои задачи сами
+    logger.info("🛑 Intake stopping")
+    stopper.cancel()
+    supervisor.cancel()
+    archiver.cancel()
+    poller.cancel()
+    await asyncio.gather(poller, supervisor, archiver, return_exceptions=True)
+    if offset is not None:
+        try:
+            await asyncio_helper.get_updates(token, offset=offset, limit=1, timeout=0)
+        except Exception as e:
+            logger.warning("Failed to confirm offset %s: %s", offset, e)
+
+    for w in pool:
+        w.updates.put(None)
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT + 5
+    for w in pool:
+        await loop.run_in_executor(None, w.proc.join, max(0.0, deadline - time.monotonic()))
+        if w.proc.is_alive():
+            logger.error("worker %d did not stop in time, killing", w.idx)
+            w.proc.kill()
+    if asyncio_helper.session_manager.session:
+        await asyncio_helper.session_manager.session.close()
+    await engine.dispose()
+    logger.info("✅ Intake stopped")
@@ -0,0 +1,152 @@
+# db/archive.py
+"""
+Архивация закрытых заявок и срок хранения переписки.
+
+Горячие таблицы requests/messages остаются обычными: на них держатся
+уникальный draft_id и FK messages → requests, а в партиционированной
+таблице каждый уникальный ключ обязан включать created_at. Поэтому
+горячие таблицы ограничиваются по размеру переносом: закрытые заявки
+старше ARCHIVE_AFTER_DAYS вместе с перепиской уезжают в requests_archive /
+messages_archive — помесячные RANGE-партиции по created_at. Партиции
+создаются по мере надобности; срок хранения переписки
+(MESSAGE_RETENTION_MONTHS) соблюдается удалением целых партиций, без
+DELETE и разрастания вакуума.
+"""
+import asyncio
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select, text
+
+from db import counters, events
+from db.database import AsyncSessionLocal
+from db.models import Message, MessageArchive, Request, RequestArchive, RequestStatus
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS       = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+MESSAGE_RETENTION_MONTHS = int(os.getenv("MESSAGE_RETENTION_MONTHS", "24"))
+ARCHIVE_EVERY            = int(os.getenv("ARCHIVE_EVERY_HOURS", "6")) * 3600
+ARCHIVE_BATCH            = 500   # заявок за транзакцию
+ARCHIVE_LOCK             = 0x636f75726965   # pg_advisory_xact_lock: один архиватор на кластер
+
+_PARTITION_RE = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def _month(ts: datetime) -> date:
+    return date(ts.year, ts.month, 1)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+async def _ensure_partitions(sess, table: str, months: set[date]):
+    for m in sorted(months):
+        await sess.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_y{m.year}m{m.month:02d} "
+            f"PARTITION OF {table} "
+            f"FOR VALUES FROM ('{m.isoformat()}') TO ('{_next_month(m).isoformat()}')"
+        ))
+
+
+async def _archive_batch(cutoff: datetime) -> int | None:
+    """Переносит одну пачку. None — архиватор уже работает в другом процессе."""
+    async with AsyncSessionLocal() as sess:
+        if not await sess.scalar(select(func.pg_try_advisory_xact_lock(ARCHIVE_LOCK))):
+            return None
+        ids = (await sess.execute(
+            select(Request.id)
+            .where(Request.status == RequestStatus.CLOSED, Request.created_at < cutoff)
+            .order_by(Request.id)
+            .limit(ARCHIVE_BATCH)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        if not ids:
+            return 0
+
+        msgs = (await sess.execute(
+            delete(Message).where(Message.request_id.in_(ids))
+            .returning(*Message.__table__.c)
+        )).mappings().all()
+        reqs = (await sess.execute(
+            delete(Request).where(Request.id.in_(ids))
+            .returning(*Request.__table__.c)
+        )).mappings().all()
+
+        now = datetime.utcnow()
+        req_rows = [{**r, "created_at": r["created_at"] or now, "archived_at": now} for r in reqs]
+        msg_rows = [{**m, "created_at": m["created_at"] or now} for m in msgs]
+
+        await _ensure_partitions(sess, "requests_archive", {_month(r["created_at"]) for r in req_rows})
+        await sess.execute(insert(RequestArchive), req_rows)
+        if msg_rows:
+            await _ensure_partitions(sess, "messages_archive", {_month(m["created_at"]) for m in msg_rows})
+            await sess.execute(insert(MessageArchive), msg_rows)
+
+        await counters.bump(sess, {
+            counters.req_key(RequestStatus.CLOSED): -len(req_rows),
+            counters.ARCHIVED_KEY: len(req_rows),
+        })
+        # заявки пропали из горячей таблицы — кэши и снимки на всех узлах сбрасываются
+        await events.publish(sess, "request_changed", ids=[r["id"] for r in req_rows],
+                             user_ids=sorted({r["user_id"] for r in req_rows}))
+        await sess.commit()
+        return len(req_rows)
+
+
+async def archive_closed(after_days: int = ARCHIVE_AFTER_DAYS) -> int:
+    """Переносит в архив закрытые заявки старше after_days. Возвращает число заявок."""
+    cutoff = datetime.utcnow() - timedelta(days=after_days)
+    moved = 0
+    while True:
+        n = await _archive_batch(cutoff)
+        if not n:
+            return moved
+        moved += n
+
+
+async def drop_expired_messages(months: int = MESSAGE_RETENTION_MONTHS) -> list[str]:
+    """Удаляет партиции архива переписки, целиком вышедшие за срок хранения."""
+    today = date.today()
+    # первая партиция, которую ещё храним
+    keep_from = date(today.year, today.month, 1)
+    for _ in range(months):
+        keep_from = date(keep_from.year - (keep_from.month == 1), (keep_from.month - 2) % 12 + 1, 1)
+
+    dropped = []
+    async with AsyncSessionLocal() as sess:
+        names = (await sess.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'messages_archive'"
+        ))).scalars().all()
+        for name in names:
+            m = _PARTITION_RE.search(name)
+            if m and date(int(m[1]), int(m[2]), 1) < keep_from:
+                await sess.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+                dropped.append(name)
+        await sess.commit()
+    return dropped
+
+
+async def run_once():
+    moved = await archive_closed()
+    dropped = await drop_expired_messages()
+    if moved or dropped:
+        logger.info("🗄 Archived %d closed requests, dropped %d message partitions", moved, len(dropped))
+
+
+async def archive_loop():
+    """Фоновая задача: архивация раз в ARCHIVE_EVERY секунд."""
+    while True:
+        try:
+            await run_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Archive job failed")
+        await asyncio.sleep(ARCHIVE_EVERY)
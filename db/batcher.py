@@ -0,0 +1,103 @@
+# db/batcher.py
+"""
+Отложенная пакетная запись append-only строк (сейчас — Message).
+
+add() кладёт строку в буфер и сразу возвращает future; буфер сбрасывается
+одним многострочным INSERT через max_delay секунд или при накоплении
+max_rows строк. Кому нужно read-your-writes — делает await future
+(или await writer.flush()). На остановке бота буфер сбрасывается в close().
+
+Если пакет не записался (например, одна строка нарушает FK), строки
+пишутся по одной, чтобы ошибка одной не потеряла остальные.
+"""
+import asyncio
+import logging
+
+from sqlalchemy import insert
+
+from db.database import AsyncSessionLocal
+from db.models import Message
+
+logger = logging.getLogger(__name__)
+
+
+def _consume(fut: asyncio.Future):
+    # ошибки уже залогированы; не даём asyncio ругаться на «never retrieved»
+    if not fut.cancelled():
+        fut.exception()
+
+
+class BatchWriter:
+    def __init__(self, model, max_rows: int = 200, max_delay: float = 0.005):
+        self.model = model
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._rows: list[dict] = []
+        self._futures: list[asyncio.Future] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+        self._closed = False
+
+    def add(self, **row) -> asyncio.Future:
+        if self._closed:
+            raise RuntimeError(f"{self.model.__name__} writer is closed")
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        fut.add_done_callback(_consume)
+        self._rows.append(row)
+        self._futures.append(fut)
+        if len(self._rows) >= self.max_rows:
+            self._kick()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._kick)
+        return fut
+
+    def _kick(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Пишет всё накопленное к этому моменту; пакеты идут строго по очереди."""
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            rows, futures = self._rows, self._futures
+            self._rows, self._futures = [], []
+            if not rows:
+                return
+            try:
+                await self._write(rows)
+            except Exception as e:
+                logger.warning("Batch of %d %s rows failed (%s), retrying one by one",
+                               len(rows), self.model.__tablename__, e)
+                for row, fut in zip(rows, futures):
+                    try:
+                        await self._write([row])
+                    except Exception as row_err:
+                        logger.error("Dropped %s row %s: %s", self.model.__tablename__, row, row_err)
+                        fut.set_exception(row_err)
+                    else:
+                        fut.set_result(None)
+                return
+            for fut in futures:
+                fut.set_result(None)
+
+    async def _write(self, rows: list[dict]):
+        async with AsyncSessionLocal() as sess:
+            await sess.execute(insert(self.model), rows)
+            await sess.commit()
+
+    async def close(self):
+        self._closed = True
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+
+MESSAGES = BatchWriter(Message)
@@ -0,0 +1,104 @@
+# db/bulk.py
+"""
+Массовые операции над заявками и оборудованием.
+
+Каждая операция — один UPDATE … WHERE id = ANY(:ids) RETURNING в общей
+транзакции вызывающего; старый статус берётся из подзапроса с FOR UPDATE,
+чтобы счётчики сдвинулись ровно на изменённые строки.
+"""
+from typing import List, Sequence
+
+from sqlalchemy import ARRAY, Integer, String, any_, bindparam, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import counters, events
+from db.models import Equipment, EquipmentStatus, Request, RequestStatus, User
+
+
+def _ids_param(ids: Sequence, item_type):
+    return any_(bindparam("ids", list(ids), type_=ARRAY(item_type)))
+
+
+async def set_request_status(sess: AsyncSession, ids: Sequence[int], status: RequestStatus):
+    """Меняет статус; возвращает (id, user_id, category, priority, old_status) изменённых."""
+    old = (
+        select(Request.id, Request.status.label("old_status"))
+        .where(Request.id == _ids_param(ids, Integer))
+        .where(Request.status != status)
+        .with_for_update()
+        .subquery()
+    )
+    rows = (await sess.execute(
+        update(Request)
+        .where(Request.id == old.c.id)
+        .values(status=status)
+        .returning(Request.id, Request.user_id, Request.category, Request.priority, old.c.old_status)
+    )).all()
+    await counters.track_requests(
+        sess, [(r.category, r.priority, r.old_status, status) for r in rows]
+    )
+    if rows:
+        await events.publish(sess, "request_changed", ids=[r.id for r in rows],
+                             user_ids=sorted({r.user_id for r in rows}))
+    return rows
+
+
+async def reassign_requests(sess: AsyncSession, ids: Sequence[int], user_id: int):
+    """Передаёт заявки другому курьеру; возвращает (id, old_user_id) изменённых."""
+    await sess.execute(
+        pg_insert(User).values(id=user_id, name="")
+        .on_conflict_do_nothing(index_elements=[User.id])
+    )
+    old = (
+        select(Request.id, Request.user_id.label("old_user_id"))
+        .where(Request.id == _ids_param(ids, Integer))
+        .where(Request.user_id != user_id)
+        .with_for_update()
+        .subquery()
+    )
+    rows = (await sess.execute(
+        update(Request)
+        .where(Request.id == old.c.id)
+        .values(user_id=user_id)
+        .returning(Request.id, old.c.old_user_id)
+    )).all()
+    if rows:
+        await events.publish(sess, "request_changed", ids=[r.id for r in rows],
+                             user_ids=sorted({user_id} | {r.old_user_id for r in rows}))
+    return rows
+
+
+async def set_equipment_status(sess: AsyncSession, eq_ids: Sequence[str], status: EquipmentStatus):
+    """
+    На склад — статус IN_STOCK и снятие с курьера, в ремонт — только статус.
+    Возвращает (eq_id, assigned_to до изменения, old_status) изменённых.
+    """
+    values = {"status": status}
+    if status == EquipmentStatus.IN_STOCK:
+        values["assigned_to"] = None
+    old = (
+        select(Equipment.id, Equipment.status.label("old_status"),
+               Equipment.assigned_to.label("old_assigned_to"))
+        .where(Equipment.eq_id == _ids_param(eq_ids, String))
+        .where(Equipment.status != status)
+        .with_for_update()
+        .subquery()
+    )
+    rows = (await sess.execute(
+        update(Equipment)
+        .where(Equipment.id == old.c.id)
+        .values(**values)
+        .returning(Equipment.eq_id, old.c.old_assigned_to, old.c.old_status)
+    )).all()
+    await counters.track_equipment(sess, [(r.old_status, status) for r in rows])
+    if rows:
+        await events.publish(sess, "equipment_changed", eq_ids=[r.eq_id for r in rows],
+                             user_ids=sorted({r.old_assigned_to for r in rows} - {None}))
+    return rows
+
+
+def missing(requested: Sequence, found: List) -> List:
+    """Какие из запрошенных ID не изменились (нет такого или статус уже тот же)."""
+    found = set(found)
+    return [x for x in requested if x not in found]
@@ -0,0 +1,142 @@
+# db/counters.py
+"""
+Сводные счётчики для заголовков списков и команды /stats.
+
+Счётчики меняются в той же транзакции, что и сами заявки/оборудование,
+поэтому для «сколько всего» не нужно читать таблицы целиком.
+
+Для заголовков списков снимок счётчиков кэшируется в процессе; кэш
+сбрасывается локально при bump() и на всех процессах — по событиям шины
+(db.events), плюс страховочный TTL.
+"""
+import time
+from collections import Counter as Tally
+from typing import Iterable
+
+from sqlalchemy import select, func, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Counter, Equipment, EquipmentStatus, Request, RequestArchive, RequestStatus
+
+ACTIVE_STATUSES = (RequestStatus.OPEN, RequestStatus.NEED_INFO, RequestStatus.IN_PROGRESS)
+
+
+def eq_key(status: EquipmentStatus) -> str:
+    return f"eq:{status.value}"
+
+
+def req_key(status: RequestStatus) -> str:
+    return f"req:{status.value}"
+
+
+def cat_key(category: str) -> str:
+    return f"req_cat:{category}"
+
+
+def prio_key(priority: str) -> str:
+    return f"req_prio:{priority}"
+
+
+EQ_KEYS      = [eq_key(s) for s in EquipmentStatus]
+ACTIVE_KEYS  = [req_key(s) for s in ACTIVE_STATUSES]
+ARCHIVED_KEY = "req:archived"   # закрытые заявки, перенесённые в requests_archive
+
+CACHE_TTL = 60   # сек.
+_cache: dict[str, int] | None = None
+_cache_at = 0.0
+
+
+def invalidate(_event=None):
+    global _cache
+    _cache = None
+
+
+async def bump(sess: AsyncSession, deltas: dict[str, int]):
+    """Атомарно прибавляет дельты к счётчикам (INSERT … ON CONFLICT)."""
+    # строки блокируются в порядке VALUES: один порядок для всех — без взаимоблокировок
+    rows = [{"name": k, "value": v} for k, v in sorted(deltas.items()) if v]
+    if not rows:
+        return
+    invalidate()
+    stmt = pg_insert(Counter).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Counter.name],
+        set_={"value": Counter.value + stmt.excluded.value},
+    )
+    await sess.execute(stmt)
+
+
+async def track_equipment(sess: AsyncSession,
+                          changes: Iterable[tuple[EquipmentStatus | None, EquipmentStatus]]):
+    """changes: (старый статус или None для новой единицы, новый статус)."""
+    tally = Tally()
+    for old, new in changes:
+        if old == new:
+            continue
+        if old is not None:
+            tally[eq_key(old)] -= 1
+        tally[eq_key(new)] += 1
+    await bump(sess, tally)
+
+
+async def track_requests(sess: AsyncSession,
+                         changes: Iterable[tuple[str, str, RequestStatus | None, RequestStatus]]):
+    """changes: (категория, приоритет, старый статус или None для новой заявки, новый статус)."""
+    tally = Tally()
+    for category, priority, old, new in changes:
+        if old == new:
+            continue
+        if old is not None:
+            tally[req_key(old)] -= 1
+            if old in ACTIVE_STATUSES:
+                tally[cat_key(category)] -= 1
+                tally[prio_key(priority)] -= 1
+        tally[req_key(new)] += 1
+        if new in ACTIVE_STATUSES:
+            tally[cat_key(category)] += 1
+            tally[prio_key(priority)] += 1
+    await bump(sess, tally)
+
+
+async def read(sess: AsyncSession, names: Iterable[str] | None = None) -> dict[str, int]:
+    stmt = select(Counter.name, Counter.value)
+    if names is not None:
+        stmt = stmt.where(Counter.name.in_(list(names)))
+    return {name: value for name, value in (await sess.execute(stmt)).all()}
+
+
+async def total(sess: AsyncSession, names: Iterable[str]) -> int:
+    """Сумма счётчиков из кэшированного снимка (весь снимок — одна маленькая таблица)."""
+    global _cache, _cache_at
+    if _cache is None or time.monotonic() - _cache_at > CACHE_TTL:
+        _cache, _cache_at = await read(sess), time.monotonic()
+    return sum(_cache.get(name, 0) for name in names)
+
+
+async def rebuild(sess: AsyncSession):
+    """Полный пересчёт счётчиков по таблицам (первый запуск или /stats rebuild)."""
+    tally = Tally()
+    for status, cnt in await sess.execute(
+        select(Equipment.status, func.count()).group_by(Equipment.status)
+    ):
+        tally[eq_key(status)] += cnt
+    for status, cnt in await sess.execute(
+        select(Request.status, func.count()).group_by(Request.status)
+    ):
+        tally[req_key(status)] += cnt
+    tally[ARCHIVED_KEY] += await sess.scalar(select(func.count()).select_from(RequestArchive))
+
+    active = Request.status.in_(ACTIVE_STATUSES)
+    for category, cnt in await sess.execute(
+        select(Request.category, func.count()).where(active).group_by(Request.category)
+    ):
+        tally[cat_key(category)] += cnt
+    for priority, cnt in await sess.execute(
+        select(Request.priority, func.count()).where(active).group_by(Request.priority)
+    ):
+        tally[prio_key(priority)] += cnt
+
+    await sess.execute(delete(Counter))
+    invalidate()
+    await bump(sess, tally)
@@ -3,11 +3,13 @@
 import os
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy import select, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import OperationalError
 
 # Импортируем Base и все модели
-from db.models import Base
+from db.models import Base, Counter
+from db import counters
 
 load_dotenv()
 
@@ -29,6 +31,20 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+# create_all не меняет уже существующие таблицы — то, что добавлено позже,
+# докатываем идемпотентными DDL
+SCHEMA_UPGRADES = [
+    "ALTER TABLE requests ADD COLUMN IF NOT EXISTS draft_id VARCHAR",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_requests_draft_id ON requests (draft_id)",
+    # дашборд читает только незакрытые заявки — частичный индекс не растёт с архивом
+    "CREATE INDEX IF NOT EXISTS ix_requests_active ON requests (created_at DESC) "
+    "WHERE status <> 'CLOSED'",
+    "CREATE INDEX IF NOT EXISTS ix_messages_request_id ON messages (request_id)",
+    # keyset-страницы «Мои заявки и оборудование»
+    "CREATE INDEX IF NOT EXISTS ix_requests_user_id ON requests (user_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_equipment_assigned_to ON equipment (assigned_to, id)",
+]
+
 async def init_db():
     """
     Проверяем подключение и создаём все таблицы из моделей, если их нет.
@@ -36,6 +52,13 @@ async def init_db():
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            for ddl in SCHEMA_UPGRADES:
+                await conn.execute(text(ddl))
+        # первый запуск: заполняем счётчики по уже существующим данным
+        async with AsyncSessionLocal() as sess:
+            if await sess.scalar(select(Counter.name).limit(1)) is None:
+                await counters.rebuild(sess)
+                await sess.commit()
         print("✅ DB connected and tables created/verified")
     except OperationalError as e:
         print("❌ Failed to connect to DB:", e)
@@ -0,0 +1,121 @@
+# db/events.py
+"""
+Шина событий на LISTEN/NOTIFY Postgres.
+
+publish() вызывается внутри транзакции записи: pg_notify доставляется
+только после commit (и не доставляется при rollback). Каждый процесс
+держит одно asyncpg-соединение с LISTEN и раздаёт события локальным
+подписчикам — сбросу кэшей и живым обновлениям дашборда.
+
+События:
+    request_created   {id, user_id}
+    request_changed   {ids, user_ids}
+    equipment_changed {eq_ids, user_ids}
+    resync            {}  — локальное: переподключились, могли что-то пропустить
+
+Если полезная нагрузка не влезает в NOTIFY, вместо ID приходит truncated=True.
+"""
+import asyncio
+import inspect
+import json
+import logging
+from collections import defaultdict
+from typing import Callable
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "courier_events"
+RECONNECT_DELAY = 3      # сек.
+MAX_PAYLOAD     = 7900   # лимит pg_notify — 8000 байт
+
+_SUBSCRIBERS: dict[str, list[Callable]] = defaultdict(list)
+_TASKS: set[asyncio.Task] = set()
+_listener: asyncio.Task | None = None
+
+
+async def publish(sess: AsyncSession, kind: str, **payload):
+    data = json.dumps({"kind": kind, **payload})
+    if len(data.encode()) > MAX_PAYLOAD:
+        # крупная массовая операция: подписчики сбросят всё, а не по ID
+        data = json.dumps({"kind": kind, "truncated": True})
+    await sess.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": data},
+    )
+
+
+def subscribe(kind: str, handler: Callable):
+    """handler(event: dict) — обычная функция или корутина; kind="*" — все события."""
+    _SUBSCRIBERS[kind].append(handler)
+
+
+def emit(event: dict):
+    """Раздаёт событие подписчикам этого процесса."""
+    for handler in _SUBSCRIBERS[event["kind"]] + _SUBSCRIBERS["*"]:
+        try:
+            result = handler(event)
+        except Exception:
+            logger.exception("Event handler failed for %s", event["kind"])
+            continue
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            _TASKS.add(task)
+            task.add_done_callback(_TASKS.discard)
+
+
+def _on_notify(_conn, _pid, _channel, payload: str):
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        logger.warning("Bad event payload: %r", payload)
+        return
+    emit(event)
+
+
+async def _listen():
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    first = True
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(dsn)
+            await conn.add_listener(CHANNEL, _on_notify)
+            logger.info("📡 Listening on %s", CHANNEL)
+            if not first:
+                # пока соединения не было, события могли потеряться
+                emit({"kind": "resync"})
+            first = False
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _c: closed.set())
+            await closed.wait()
+            logger.warning("Event listener connection lost")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Event listener error: %s", e)
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def start():
+    global _listener
+    if _listener is None:
+        _listener = asyncio.create_task(_listen())
+
+
+async def stop():
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        await asyncio.gather(_listener, return_exceptions=True)
+        _listener = None
+    if _TASKS:
+        await asyncio.gather(*_TASKS, return_exceptions=True)
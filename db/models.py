@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Enum, ARRAY
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Enum, ARRAY, JSON
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 import enum
@@ -32,9 +32,10 @@ class Request(Base):
     title       = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     priority    = Column(String, nullable=False)
-    photos      = Column(ARRAY(String), nullable=True)
+    photos      = Column(ARRAY(String), nullable=True)   # photos.file_unique_id (старые — file_id)
     status      = Column(Enum(RequestStatus), default=RequestStatus.OPEN)
     created_at  = Column(DateTime, default=datetime.utcnow)
+    draft_id    = Column(String, unique=True, index=True, nullable=True)  # ключ идемпотентности
 
     user = relationship("User", back_populates="requests")
 
@@ -57,3 +58,54 @@ class Message(Base):
     text       = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# ───── архив: закрытые заявки и их переписка, помесячные партиции по created_at ─────
+class RequestArchive(Base):
+    __tablename__  = "requests_archive"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+    id          = Column(Integer, primary_key=True)
+    created_at  = Column(DateTime, primary_key=True)
+    user_id     = Column(Integer, nullable=False)
+    category    = Column(String, nullable=False)
+    subcategory = Column(String, nullable=True)
+    title       = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    priority    = Column(String, nullable=False)
+    photos      = Column(ARRAY(String), nullable=True)
+    status      = Column(Enum(RequestStatus), nullable=False)
+    draft_id    = Column(String, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class MessageArchive(Base):
+    __tablename__  = "messages_archive"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+    id         = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, primary_key=True)
+    request_id = Column(Integer, nullable=True, index=True)
+    from_user  = Column(Integer, nullable=False)
+    to_user    = Column(Integer, nullable=False)
+    text       = Column(Text, nullable=False)
+
+class Photo(Base):
+    """Фото по file_unique_id: одно и то же фото хранится один раз."""
+    __tablename__ = "photos"
+    file_unique_id = Column(String, primary_key=True)
+    file_id        = Column(String, nullable=False)   # самый крупный PhotoSize
+    thumb_file_id  = Column(String, nullable=False)   # самый маленький — для превью
+    width          = Column(Integer, nullable=True)
+    height         = Column(Integer, nullable=True)
+    file_size      = Column(Integer, nullable=True)
+    created_at     = Column(DateTime, default=datetime.utcnow)
+
+class Counter(Base):
+    __tablename__ = "counters"
+    name  = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class Draft(Base):
+    """Незавершённые диалоги, сохранённые при остановке бота."""
+    __tablename__ = "drafts"
+    id       = Column(String, primary_key=True)
+    kind     = Column(String, nullable=False)
+    user_id  = Column(Integer, nullable=False, index=True)
+    data     = Column(JSON, nullable=False)
+    saved_at = Column(DateTime, default=datetime.utcnow)
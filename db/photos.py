@@ -0,0 +1,32 @@
+# db/photos.py
+"""Хранилище фото: запись с дедупликацией по file_unique_id и выдача для превью."""
+from typing import List, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Photo
+
+
+async def store(sess: AsyncSession, photos: Sequence) -> List[str]:
+    """
+    Сохраняет метаданные (уже известные фото не дублируются) и возвращает
+    ключи для Request.photos. Строки — file_id из старых черновиков — проходят как есть.
+    """
+    metas = [p for p in photos if isinstance(p, dict)]
+    if metas:
+        await sess.execute(
+            pg_insert(Photo).values(metas)
+            .on_conflict_do_nothing(index_elements=[Photo.file_unique_id])
+        )
+    return [p["file_unique_id"] if isinstance(p, dict) else p for p in photos]
+
+
+async def resolve(sess: AsyncSession, keys: Sequence[str], thumbs: bool) -> List[str]:
+    """file_id для отправки в порядке keys; ключи без записи в photos — это старые file_id."""
+    rows = (await sess.execute(
+        select(Photo).where(Photo.file_unique_id.in_(list(keys)))
+    )).scalars().all()
+    by_key = {p.file_unique_id: (p.thumb_file_id if thumbs else p.file_id) for p in rows}
+    return [by_key.get(k, k) for k in keys]
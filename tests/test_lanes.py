@@ -0,0 +1,75 @@
+# tests/test_lanes.py
+"""Альбом через очередь пользователя в многопроцессном режиме (bot.lifecycle.UserLanes)."""
+import asyncio
+import unittest
+
+from telebot.async_telebot import AsyncTeleBot, types
+
+from bot.albums import collect_album
+from bot.lifecycle import UserLanes, drain
+
+USER_ID = 7
+
+
+def _update(update_id: int, **message) -> types.Update:
+    return types.Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": USER_ID, "type": "private"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "courier"},
+            **message,
+        },
+    })
+
+
+def _photo(n: int, group: str | None = None) -> types.Update:
+    sizes = [
+        {"file_id": f"s{n}", "file_unique_id": f"us{n}", "width": 90, "height": 90},
+        {"file_id": f"b{n}", "file_unique_id": f"ub{n}", "width": 1280, "height": 1280},
+    ]
+    extra = {"media_group_id": group} if group else {}
+    return _update(n, photo=sizes, **extra)
+
+
+class AlbumThroughLanesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.bot = AsyncTeleBot("1:test")
+        self.albums: list[list[str]] = []
+        self.texts: list[tuple[str, int]] = []
+
+        @self.bot.message_handler(content_types=["photo"])
+        async def photo(message):
+            batch = await collect_album(message)
+            if batch is not None:
+                self.albums.append([m.photo[-1].file_id for m in batch])
+
+        @self.bot.message_handler(content_types=["text"])
+        async def text(message):
+            # сколько альбомов было собрано к моменту обработки текста
+            self.texts.append((message.text, len(self.albums)))
+
+    async def test_album_split_across_batches_is_collected_once(self):
+        lanes = UserLanes(self.bot)
+        album = [_photo(n, group="g1") for n in range(1, 5)]
+        lanes.push(USER_ID, album[:2])
+        await asyncio.sleep(0.1)   # остаток альбома пришёл следующей пачкой
+        lanes.push(USER_ID, album[2:] + [_update(5, text="Далее")])
+        await drain(5)
+
+        self.assertEqual(self.albums, [["b1", "b2", "b3", "b4"]])
+        # текст после альбома обработан только когда альбом уже собран
+        self.assertEqual(self.texts, [("Далее", 1)])
+
+    async def test_plain_updates_keep_order(self):
+        lanes = UserLanes(self.bot)
+        lanes.push(USER_ID, [_update(1, text="a"), _photo(2), _update(3, text="b")])
+        await drain(5)
+
+        self.assertEqual(self.albums, [["b2"]])
+        self.assertEqual(self.texts, [("a", 0), ("b", 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()